@@ -0,0 +1,47 @@
+"""
+Hexcrawl, a hex map explorer for the terminal.
+
+Run it with python -m hexcrawl. The world model, generators and file
+format don't need a terminal, and importing this package only loads
+the modules whose names are actually used:
+
+    from hexcrawl import TerrainGenerator, World
+"""
+
+import importlib
+
+# Public names, and the module each one lives in.
+EXPORTS = {
+    "World": "world",
+    "ChunkedWorld": "world",
+    "TerrainGenerator": "generator",
+    "NoiseGenerator": "generator",
+    "Pathfinder": "pathfinding",
+    "FeatureIndex": "features",
+    "FieldOfView": "fov",
+    "Exploration": "explore",
+    "HexBits": "explore",
+    "MappedWorld": "mapfile",
+    "load_world": "mapfile",
+    "save_world": "mapfile",
+    "generate_world": "parallel",
+    "FrameProfiler": "profiler",
+    "AnsiBackend": "compositor",
+    "Compositor": "compositor",
+    "Overview": "overview",
+    "Palette": "palette",
+    "Hex": "tui",
+    "TUI": "tui",
+}
+
+__all__ = sorted(EXPORTS)
+
+
+def __getattr__(name):
+    module = EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
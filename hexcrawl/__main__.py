@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+The hexcrawl command: python -m hexcrawl [options]
+
+Only the argument parser is loaded up front. curses and the game itself
+are imported once the arguments are known, so --help and bad arguments
+come back straight away.
+"""
+
+import argparse
+import sys
+
+
+def seed_number(text):
+    """
+    Parse a seed, which has to fit in the 64 bits a world file keeps.
+    """
+    seed = int(text)
+    if not 0 <= seed < 2 ** 64:
+        raise argparse.ArgumentTypeError(
+            f"seed must be from 0 to {2 ** 64 - 1}: {text}")
+
+    return seed
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        prog="hexcrawl", description="Explore a hex map in the terminal.")
+    parser.add_argument("--rows", type=int, default=20,
+                        help="map height in hexes, 0 for no edge")
+    parser.add_argument("--columns", type=int, default=30,
+                        help="map width in hexes, 0 for no edge")
+    parser.add_argument("--seed", type=seed_number,
+                        help="seed for the terrain generator")
+    parser.add_argument("--terrain", choices=("noise", "random"),
+                        default="noise",
+                        help="smooth noise terrain, or every hex at random")
+    parser.add_argument("--load", metavar="FILE",
+                        help="explore a saved world file")
+    parser.add_argument("--save", metavar="FILE",
+                        help="generate a world, save it to FILE and exit")
+    parser.add_argument("--processes", type=int,
+                        help="processes to generate with when saving, "
+                        "by default one per CPU")
+    parser.add_argument("--no-fog", dest="fog", action="store_false",
+                        help="show the whole map from the start")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="record frame timings and write them to FILE "
+                        "on exit, as CSV if it ends in .csv, else JSON")
+    parser.add_argument("--ansi", action="store_true",
+                        help="write to the terminal directly, sending only "
+                        "the characters that changed, instead of through "
+                        "curses")
+
+    return parser.parse_args(args)
+
+
+def run(args):
+    from .generator import GENERATORS
+
+    world = None
+    seed = args.seed
+    if args.load and not args.save:
+        from .mapfile import load_world
+
+        try:
+            world = load_world(args.load)
+        except (OSError, ValueError) as error:
+            sys.exit(f"hexcrawl: {error}")
+        # The world's own seed, so it is shown and saved under it.
+        seed = world.seed
+
+    generator = GENERATORS[args.terrain](seed)
+    if args.save:
+        from .parallel import generate_file
+
+        if not args.rows or not args.columns:
+            sys.exit("hexcrawl: can't save a world without edges")
+        generate_file(generator, args.save, args.rows, args.columns,
+                      args.processes)
+        return
+
+    import curses
+
+    from .tui import main
+
+    curses.wrapper(main, args.rows or None, args.columns or None, seed,
+                   world, generator, args.fog, args.profile, args.ansi)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+"""
+Frame benchmarks.
+
+Runs the TUI against the ANSI backend, writing to the null device, so no
+terminal is needed, and times full draws, selection moves, scrolls,
+resizes and panning the zoomed out overview on maps of several sizes.
+Every operation ends with one frame sent to the terminal. For every case
+it reports operations per second, the addstr calls and characters
+written per operation, the bytes the frame took to send, and the peak
+memory allocated while running it. Memory is measured in a second pass,
+since tracing allocations slows everything down several times over.
+
+With --check, it exits with an error if any case runs slower than
+MIN_OPS, which is set far below what any machine should manage, so
+that only real regressions fail.
+
+    python -m hexcrawl.bench [--quick] [--check] [--seed SEED]
+"""
+
+import argparse
+import curses
+import os
+import sys
+import time
+import tracemalloc
+
+from .compositor import AnsiBackend
+from .palette import Palette
+from .tui import DIRECTION_KEYS, OVERVIEW_LEVEL, TUI
+
+MAP_SIZES = ((20, 30), (100, 100), (500, 500), (2000, 2000))
+SCREEN_SIZES = ((50, 160), (40, 120))
+# Keys that walk the selection around in a loop.
+MOVE_KEYS = [key for key, direction in DIRECTION_KEYS.items()
+             if direction in ("right", "down_right", "down", "up_left")]
+MOVE_KEYS = MOVE_KEYS * 4 + [ord("4")] * 4 + [ord("8")] * 4
+SCROLL_KEYS = [curses.KEY_RIGHT] * 24 + [curses.KEY_DOWN] * 12 + \
+    [curses.KEY_LEFT] * 24 + [curses.KEY_UP] * 12
+# Operations per second below which --check fails, about a tenth of
+# what a slow machine does.
+MIN_OPS = {"full draw": 20, "move": 100, "scroll": 40, "resize": 20,
+           "overview": 10}
+
+
+class Bench:
+
+    def __init__(self, rows, columns, seed=1):
+        self.output = open(os.devnull, "wb")
+        self.backend = AnsiBackend(None, self.output, *SCREEN_SIZES[0])
+        palette = Palette()
+        palette.setup(self.backend)
+        self.ui = TUI(self.backend.screen, rows, columns, seed,
+                      backend=self.backend, palette=palette)
+        self.ui.draw()
+        self.ui.select_hex(2, 2)
+        self.frame()
+        self.resizes = 0
+
+    def frame(self):
+        self.ui.refresh_pad()
+        self.ui.refresh_info()
+        self.backend.doupdate()
+
+    def full_draw(self):
+        self.ui.draw()
+        # And send all of it, as after the terminal was cleared.
+        self.backend.compositor.reset(*self.backend.screen.getmaxyx())
+        self.frame()
+
+    def press(self, key):
+        self.ui.handle_keys([key])
+        self.ui.normalize_pos()
+        self.ui.scroll_to_selected_hex()
+        self.frame()
+
+    def scroll(self, key):
+        # Without following the selection, which would scroll right back.
+        self.ui.handle_keys([key])
+        self.ui.normalize_pos()
+        self.frame()
+
+    def resize(self):
+        self.resizes += 1
+        self.backend.resize(*SCREEN_SIZES[self.resizes % len(SCREEN_SIZES)])
+        # Skip the wait for more resize events.
+        self.ui.handle_keys(self.ui.read_keys())
+        self.ui.resize()
+        self.ui.scroll_to_selected_hex()
+        self.frame()
+
+    def get_ops(self, name, count):
+        """
+        Return count operations of the named kind, as functions.
+        """
+        if name == "full draw":
+            ops = [self.full_draw] * count
+        elif name == "move":
+            ops = [lambda key=key: self.press(key)
+                   for key in (MOVE_KEYS * count)[:count]]
+        elif name == "scroll":
+            ops = [lambda key=key: self.scroll(key)
+                   for key in (SCROLL_KEYS * count)[:count]]
+        elif name == "resize":
+            ops = [self.resize] * count
+        elif name == "overview":
+            self.ui.set_zoom(OVERVIEW_LEVEL)
+            ops = [lambda key=key: self.scroll(key)
+                   for key in (SCROLL_KEYS * count)[:count]]
+            ops.append(lambda: self.ui.set_zoom(None))
+        else:
+            raise ValueError(f"Unknown benchmark {name}")
+
+        return ops
+
+    def run(self, name, count):
+        """
+        Time count operations of the named kind, and then run them again
+        to measure memory. Returns ops/sec, addstr calls, characters and
+        bytes sent per op, and the peak memory in bytes.
+        """
+        stats = self.backend.stats
+        stats.reset()
+        ops = self.get_ops(name, count)
+        start = time.perf_counter()
+        for op in ops:
+            op()
+        elapsed = time.perf_counter() - start
+        calls = stats.addstr_calls
+        chars = stats.chars_written
+        sent = stats.bytes_written
+
+        ops = self.get_ops(name, count)
+        tracemalloc.start()
+        for op in ops:
+            op()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return count / elapsed, calls / count, chars / count, sent / count, \
+            peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hexcrawl frame benchmarks")
+    parser.add_argument("--quick", action="store_true",
+                        help="run fewer operations per case")
+    parser.add_argument("--check", action="store_true",
+                        help="fail if any case is slower than MIN_OPS")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    counts = {"full draw": 20, "move": 200, "scroll": 200, "resize": 10,
+              "overview": 200}
+    if args.quick:
+        counts = {name: max(count // 10, 1)
+                  for name, count in counts.items()}
+
+    print(f"{'map':>11} {'case':<10} {'ops/sec':>10} {'addstr/op':>10} "
+          f"{'chars/op':>10} {'bytes/op':>10} {'peak KiB':>10}")
+    slow = []
+    for rows, columns in MAP_SIZES:
+        bench = Bench(rows, columns, args.seed)
+        for name, count in counts.items():
+            ops, calls, chars, sent, peak = bench.run(name, count)
+            print(f"{rows:>5}x{columns:<5} {name:<10} {ops:>10.1f} "
+                  f"{calls:>10.1f} {chars:>10.1f} {sent:>10.1f} "
+                  f"{peak / 1024:>10.1f}")
+            if ops < MIN_OPS[name] or not sent:
+                slow.append(f"{rows}x{columns} {name}")
+
+    if args.check and slow:
+        sys.exit("Too slow, or nothing sent: " + ", ".join(slow))
+
+
+if __name__ == "__main__":
+    main()
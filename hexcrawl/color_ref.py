@@ -25,4 +25,5 @@ def main(stdscr):
     stdscr.getch()
 
 
-curses.wrapper(main)
+if __name__ == "__main__":
+    curses.wrapper(main)
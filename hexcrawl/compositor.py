@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+"""
+Terminal output that only sends what changed.
+
+AnsiBackend is the headless backend with a terminal on the other end.
+Windows are drawn into its in-memory screen as usual, and once per
+frame doupdate hands that screen to a Compositor. The compositor keeps a
+shadow copy of what the terminal shows, and sends only the runs of cells
+that differ from it, as ANSI escape sequences in a single write. Runs
+close together on a line are joined, since rewriting a few unchanged
+cells is shorter than moving the cursor past them, the cursor is moved
+with the shortest sequence that gets it there, and attributes are
+changed by sending only the parts that differ.
+
+Colours come from the colour pairs set up on the backend, so a Palette
+works with it unchanged. Input still comes from curses, which keeps the
+terminal in the right modes, when a curses screen is given.
+"""
+
+import curses
+from itertools import compress, count, groupby
+from operator import ne, or_
+
+from .headless import HeadlessBackend, HeadlessWindow
+
+CSI = "\x1b["
+# Unchanged cells between two changed ones that are written over rather
+# than moved past. Moving the cursor along a line takes four or five
+# bytes.
+MAX_GAP = 5
+FLAGS = ((curses.A_BOLD, "1"), (curses.A_UNDERLINE, "4"),
+         (curses.A_REVERSE, "7"))
+HIDE_CURSOR = CSI + "?25l"
+SHOW_CURSOR = CSI + "?25h"
+
+
+def get_runs(line, attrs, old_line, old_attrs, max_gap=MAX_GAP):
+    """
+    Return the (start, end) column ranges of a line that changed, joining
+    ranges less than max_gap unchanged cells apart.
+    """
+    runs = []
+    start = end = None
+    # The cells are compared in C, and only the changed ones looked at.
+    changed = compress(count(), map(or_, map(ne, line, old_line),
+                                    map(ne, attrs, old_attrs)))
+    for column in changed:
+        if start is not None and column - end < max_gap:
+            end = column + 1
+            continue
+        if start is not None:
+            runs.append((start, end))
+        start = column
+        end = column + 1
+    if start is not None:
+        runs.append((start, end))
+
+    return runs
+
+
+class Compositor:
+
+    def __init__(self, output, pairs, rows=0, columns=0):
+        # A binary stream, such as sys.stdout.buffer.
+        self.output = output
+        # Colour pairs by number, as (foreground, background).
+        self.pairs = pairs
+        self.sgr = {}
+        self.reset(rows, columns)
+
+    def reset(self, rows, columns):
+        """
+        Forget what the terminal shows. The next update clears it and
+        sends the whole screen.
+        """
+        self.chars = [[" "] * columns for row in range(rows)]
+        self.attrs = [[0] * columns for row in range(rows)]
+        self.clear = True
+
+    def get_colors(self, attr):
+        pair = self.pairs.get((attr & curses.A_COLOR) >> 8)
+        if not pair:
+            return "39", "49"
+
+        return str(30 + pair[0]), str(40 + pair[1])
+
+    def get_sgr(self, attr, current=None):
+        """
+        Return the escape sequence that switches from the current curses
+        attribute to attr, or to attr from scratch if current is None.
+        """
+        key = (current, attr)
+        sgr = self.sgr.get(key)
+        if sgr is None:
+            flags = [(flag, code) for flag, code in FLAGS if attr & flag]
+            old_flags = [(flag, code) for flag, code in FLAGS
+                         if current is not None and current & flag]
+            colors = self.get_colors(attr)
+            if current is None or not set(old_flags) <= set(flags):
+                # Flags can only be turned off all together.
+                codes = ["0"] + [code for flag, code in flags]
+                codes += [code for code in colors if code not in
+                          ("39", "49")]
+            else:
+                codes = [code for flag, code in flags
+                         if (flag, code) not in old_flags]
+                codes += [code for code, old in
+                          zip(colors, self.get_colors(current))
+                          if code != old]
+            # Attributes that differ only in what isn't shown need
+            # nothing, and an empty sequence would reset everything.
+            sgr = CSI + ";".join(codes) + "m" if codes else ""
+            self.sgr[key] = sgr
+
+        return sgr
+
+    def move(self, cursor, row, column):
+        """
+        Return the shortest escape sequence that moves the cursor from
+        where it is, if that is known, to row, column.
+        """
+        if cursor and cursor[0] == row and cursor[1] < column:
+            distance = column - cursor[1]
+            return f"{CSI}{distance}C" if distance > 1 else CSI + "C"
+        if column == 0:
+            return f"{CSI}{row + 1}H"
+
+        return f"{CSI}{row + 1};{column + 1}H"
+
+    def update(self, chars, attrs):
+        """
+        Bring the terminal up to date with a screen, given as rows of
+        characters and attributes. Returns the number of bytes sent.
+        """
+        out = []
+        if self.clear:
+            out.append(CSI + "0m" + CSI + "2J")
+            self.clear = False
+        # Unknown until something is written.
+        current = None
+        cursor = None
+        for row, line in enumerate(chars):
+            line_attrs = attrs[row]
+            old_line = self.chars[row]
+            old_attrs = self.attrs[row]
+            if line == old_line and line_attrs == old_attrs:
+                continue
+
+            for start, end in get_runs(line, line_attrs, old_line,
+                                       old_attrs):
+                if cursor != (row, start):
+                    out.append(self.move(cursor, row, start))
+                column = start
+                for attr, cells in groupby(line_attrs[start:end]):
+                    length = len(list(cells))
+                    if attr != current:
+                        out.append(self.get_sgr(attr, current))
+                        current = attr
+                    out.append("".join(line[column:column + length]))
+                    column += length
+                # Writing the last column leaves the cursor waiting to
+                # wrap, where moving it relative to that isn't reliable.
+                cursor = (row, end) if end < len(line) else None
+            old_line[:] = line
+            old_attrs[:] = line_attrs
+
+        if not out:
+            return 0
+        data = "".join(out).encode()
+        self.output.write(data)
+        self.output.flush()
+
+        return len(data)
+
+
+class TerminalWindow(HeadlessWindow):
+    """
+    A headless window that reads its keys from the terminal.
+    """
+
+    def getch(self):
+        if self.keys:
+            return self.keys.pop(0)
+        stdscr = self.backend.stdscr
+        if not stdscr:
+            return curses.ERR
+        # Like curses, reading from a window shows it first.
+        if not self.is_pad:
+            self.refresh()
+
+        return stdscr.getch()
+
+    def timeout(self, delay):
+        if self.backend.stdscr:
+            self.backend.stdscr.timeout(delay)
+
+
+class AnsiBackend(HeadlessBackend):
+    """
+    Drop-in for the curses module that writes to the terminal itself,
+    sending only the cells that changed since the last doupdate.
+    """
+
+    def __init__(self, stdscr=None, output=None, rows=50, columns=160):
+        # The curses screen keys are read from, if there is a terminal.
+        self.stdscr = stdscr
+        if stdscr:
+            rows, columns = stdscr.getmaxyx()
+            # Let curses clear the screen now, so it has nothing left to
+            # draw when keys are read, and keep it from moving the cursor.
+            stdscr.refresh()
+            stdscr.leaveok(True)
+        super().__init__(rows, columns)
+        self.terminal = stdscr is not None
+        self.compositor = Compositor(output, self.pairs,
+                                     *self.screen.getmaxyx())
+        if output:
+            output.write(HIDE_CURSOR.encode())
+
+    def newwin(self, rows, columns, begin_row=0, begin_column=0):
+        return TerminalWindow(self, rows, columns, begin_row, begin_column)
+
+    def newpad(self, rows, columns):
+        return TerminalWindow(self, rows, columns, is_pad=True)
+
+    def doupdate(self):
+        super().doupdate()
+        if self.compositor.output:
+            screen = self.screen
+            self.stats.bytes_written += self.compositor.update(screen.chars,
+                                                              screen.attrs)
+
+    def resize(self, rows, columns):
+        super().resize(rows, columns)
+        # What the terminal shows after a resize is up to the terminal.
+        self.compositor.reset(rows, columns)
+
+    def close(self):
+        """
+        Leave the terminal with the cursor showing and plain attributes.
+        """
+        output = self.compositor.output
+        if output:
+            output.write((CSI + "0m" + SHOW_CURSOR).encode())
+            output.flush()
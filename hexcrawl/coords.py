@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+"""
+Hex grid coordinates.
+
+Hexes are addressed by row and column, with odd columns shifted half a
+hex down. Neighbour offsets therefore depend on whether the column is
+even or odd, and are looked up in precomputed tables indexed by
+column & 1 instead of being worked out per call.
+
+Anything that is easier in another system is done there and converted
+back: cube coordinates x, y, z with x + y + z == 0, or axial coordinates
+q, r, which are cube x and z. On screen, each hex is drawn in a box of
+characters starting at get_screen_pos, and from_screen tells which hex
+a character belongs to.
+"""
+
+# The six hexes that share an edge, clockwise from the top.
+NEIGHBOUR_DIRECTIONS = ("up", "up_right", "down_right",
+                        "down", "down_left", "up_left")
+
+# (row, column) offsets per direction, for even and odd columns. "left"
+# and "right" step to the next column in the same row, which is the
+# lower of the two hexes on that side in even columns and the upper one
+# in odd columns.
+OFFSETS = (
+    {
+        "up": (-1, 0),
+        "up_right": (-1, 1),
+        "right": (0, 1),
+        "down_right": (0, 1),
+        "down": (1, 0),
+        "down_left": (0, -1),
+        "left": (0, -1),
+        "up_left": (-1, -1),
+    },
+    {
+        "up": (-1, 0),
+        "up_right": (0, 1),
+        "right": (0, 1),
+        "down_right": (1, 1),
+        "down": (1, 0),
+        "down_left": (1, -1),
+        "left": (0, -1),
+        "up_left": (0, -1),
+    },
+)
+
+NEIGHBOUR_OFFSETS = tuple(
+    tuple(offsets[direction] for direction in NEIGHBOUR_DIRECTIONS)
+    for offsets in OFFSETS)
+
+# The same six directions as cube x, y, z steps.
+CUBE_DIRECTIONS = ((0, 1, -1), (1, 0, -1), (1, -1, 0),
+                   (0, -1, 1), (-1, 0, 1), (-1, 1, 0))
+
+# Characters between the tops of hexes in a column, and between the
+# left edges of hexes in a row. Odd columns start half a hex lower.
+SCREEN_ROWS = 4
+SCREEN_COLUMNS = 8
+# Where the middle of a hex is, from its top left character.
+SCREEN_CENTER = (2, 4)
+
+
+def to_cube(row, column):
+    """
+    Return the cube coordinates x, y, z of a hex, where x + y + z == 0.
+    """
+    x = column
+    z = row - (column - (column & 1)) // 2
+
+    return x, -x - z, z
+
+
+def from_cube(x, y, z):
+    """
+    Return the row and column of a hex given in cube coordinates.
+    """
+    return z + (x - (x & 1)) // 2, x
+
+
+def to_axial(row, column):
+    """
+    Return the axial coordinates q, r of a hex.
+    """
+    return column, row - (column - (column & 1)) // 2
+
+
+def from_axial(q, r):
+    return r + (q - (q & 1)) // 2, q
+
+
+def round_cube(x, y, z):
+    """
+    Return the hex, in cube coordinates, that contains a fractional
+    cube position.
+    """
+    round_x = round(x)
+    round_y = round(y)
+    round_z = round(z)
+    x_diff = abs(round_x - x)
+    y_diff = abs(round_y - y)
+    z_diff = abs(round_z - z)
+    if x_diff > y_diff and x_diff > z_diff:
+        round_x = -round_y - round_z
+    elif y_diff > z_diff:
+        round_y = -round_x - round_z
+    else:
+        round_z = -round_x - round_y
+
+    return round_x, round_y, round_z
+
+
+def get_distance(row, column, other_row, other_column):
+    """
+    Return the number of steps between two hexes.
+    """
+    x, y, z = to_cube(row, column)
+    other_x, other_y, other_z = to_cube(other_row, other_column)
+
+    return max(abs(x - other_x), abs(y - other_y), abs(z - other_z))
+
+
+def get_line(row, column, other_row, other_column):
+    """
+    Return the hexes on a straight line between two hexes, both ends
+    included, as a list of (row, column).
+    """
+    x, y, z = to_cube(row, column)
+    other_x, other_y, other_z = to_cube(other_row, other_column)
+    steps = max(abs(x - other_x), abs(y - other_y), abs(z - other_z))
+    if steps == 0:
+        return [(row, column)]
+
+    # Nudged a little off the grid lines, so that a line running right
+    # along the edge between two hexes always picks the same side.
+    x += 1e-6
+    y += 2e-6
+    z -= 3e-6
+    line = []
+    for step in range(steps + 1):
+        t = step / steps
+        line.append(from_cube(*round_cube(x + (other_x - x) * t,
+                                          y + (other_y - y) * t,
+                                          z + (other_z - z) * t)))
+
+    return line
+
+
+def get_ring(row, column, radius):
+    """
+    Return the hexes exactly radius steps away, clockwise from the one
+    straight up. The map edges are not checked.
+    """
+    if radius == 0:
+        return [(row, column)]
+
+    x, y, z = to_cube(row, column)
+    step_x, step_y, step_z = CUBE_DIRECTIONS[0]
+    x += step_x * radius
+    y += step_y * radius
+    z += step_z * radius
+    ring = []
+    # Walk each of the six sides, starting down the one to the right.
+    for direction in range(6):
+        step_x, step_y, step_z = CUBE_DIRECTIONS[(direction + 2) % 6]
+        for step in range(radius):
+            ring.append(from_cube(x, y, z))
+            x += step_x
+            y += step_y
+            z += step_z
+
+    return ring
+
+
+def get_spiral(row, column, radius):
+    """
+    Return every hex at most radius steps away, the centre first and
+    then ring by ring outwards.
+    """
+    spiral = []
+    for ring in range(radius + 1):
+        spiral.extend(get_ring(row, column, ring))
+
+    return spiral
+
+
+def get_screen_pos(row, column):
+    """
+    Return the map character position of the top left of a hex.
+    """
+    return (row * SCREEN_ROWS + (column & 1) * SCREEN_ROWS // 2,
+            column * SCREEN_COLUMNS + 1)
+
+
+def get_screen_center(row, column):
+    row_pos, column_pos = get_screen_pos(row, column)
+
+    return row_pos + SCREEN_CENTER[0], column_pos + SCREEN_CENTER[1]
+
+
+def from_screen(row_pos, column_pos):
+    """
+    Return the row and column of the hex whose middle is closest to a
+    map character position. Shared borders go to either side.
+    """
+    # Hex centres lie on a grid of flat topped hexes, stretched to the
+    # character grid: q columns are SCREEN_COLUMNS apart, and each
+    # step down in r is SCREEN_ROWS lower and half a column higher.
+    column_offset = column_pos - 1 - SCREEN_CENTER[1]
+    row_offset = row_pos - SCREEN_CENTER[0]
+    q = column_offset / SCREEN_COLUMNS
+    r = row_offset / SCREEN_ROWS - q / 2
+    x, y, z = round_cube(q, -q - r, r)
+
+    return from_cube(x, y, z)
+
+
+def get_adjacent(row, column, direction):
+    """
+    Return the row and column of the hex next to row, column in the
+    given direction. Raises KeyError for an unknown direction.
+    """
+    row_mod, column_mod = OFFSETS[column & 1][direction]
+
+    return row + row_mod, column + column_mod
+
+
+def get_neighbours(row, column):
+    """
+    Return the row and column of all six neighbours, clockwise from the
+    top. The map edges are not checked.
+    """
+    return [(row + row_mod, column + column_mod)
+            for row_mod, column_mod in NEIGHBOUR_OFFSETS[column & 1]]
+
+
+class NeighbourTable:
+    """
+    Neighbour lookups by flat index, row * columns + column, as used by
+    the arrays of a World. Neighbours outside the map are given as -1.
+    """
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.size = rows * columns
+        # How far each neighbour is from a hex, in flat indexes.
+        self.deltas = tuple(
+            tuple(row_mod * columns + column_mod
+                  for row_mod, column_mod in offsets)
+            for offsets in NEIGHBOUR_OFFSETS)
+
+    def get_neighbours(self, index):
+        """
+        Return the flat indexes of the six neighbours of a hex.
+        """
+        row, column = divmod(index, self.columns)
+        if 0 < row < self.rows - 1 and 0 < column < self.columns - 1:
+            return [index + delta for delta in self.deltas[column & 1]]
+
+        neighbours = []
+        for row_mod, column_mod in NEIGHBOUR_OFFSETS[column & 1]:
+            new_row = row + row_mod
+            new_column = column + column_mod
+            if 0 <= new_row < self.rows and 0 <= new_column < self.columns:
+                neighbours.append(new_row * self.columns + new_column)
+            else:
+                neighbours.append(-1)
+
+        return neighbours
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+What has been explored, and what can be seen right now.
+
+Hex states are kept as packed bits beside the world instead of on the
+hexes: one Python int per CHUNK_ROWS * CHUNK_COLUMNS chunk, with a bit
+for each hex at local_row * CHUNK_COLUMNS + local_column. Chunks with no
+bits set aren't stored at all, so a huge map that has barely been
+explored costs next to nothing, and bulk updates combine a whole chunk
+with a single int operation.
+"""
+
+import struct
+
+from .coords import get_spiral
+from .world import CHUNK_COLUMNS, CHUNK_ROWS
+
+CHUNK_BYTES = CHUNK_ROWS * CHUNK_COLUMNS // 8
+# How a chunk is saved: its position, then its bits.
+CHUNK_RECORD = struct.Struct(f"<ii{CHUNK_BYTES}s")
+
+
+def get_masks(hexes):
+    """
+    Return a dict mapping chunk positions to the bits of these hexes.
+    """
+    masks = {}
+    for row, column in hexes:
+        chunk_row, local_row = divmod(row, CHUNK_ROWS)
+        chunk_column, local_column = divmod(column, CHUNK_COLUMNS)
+        key = (chunk_row, chunk_column)
+        masks[key] = masks.get(key, 0) | \
+            1 << (local_row * CHUNK_COLUMNS + local_column)
+
+    return masks
+
+
+class HexBits:
+    """
+    A set of hexes, as one int of bits per chunk.
+    """
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks or {}
+
+    def __contains__(self, hex):
+        row, column = hex
+        chunk_row, local_row = divmod(row, CHUNK_ROWS)
+        chunk_column, local_column = divmod(column, CHUNK_COLUMNS)
+        bits = self.chunks.get((chunk_row, chunk_column), 0)
+
+        return bool(bits >> (local_row * CHUNK_COLUMNS + local_column) & 1)
+
+    def __len__(self):
+        return sum(bits.bit_count() for bits in self.chunks.values())
+
+    def __iter__(self):
+        for (chunk_row, chunk_column), bits in sorted(self.chunks.items()):
+            while bits:
+                low = bits & -bits
+                local_row, local_column = divmod(low.bit_length() - 1,
+                                                 CHUNK_COLUMNS)
+                yield (chunk_row * CHUNK_ROWS + local_row,
+                       chunk_column * CHUNK_COLUMNS + local_column)
+                bits ^= low
+
+    def add(self, row, column):
+        self.update([(row, column)])
+
+    def discard(self, row, column):
+        self.difference_update(HexBits(get_masks([(row, column)])))
+
+    def update(self, hexes):
+        """
+        Add many hexes, given as (row, column) pairs.
+        """
+        self.union_update(HexBits(get_masks(hexes)))
+
+    def union_update(self, other):
+        chunks = self.chunks
+        for key, bits in other.chunks.items():
+            chunks[key] = chunks.get(key, 0) | bits
+
+    def difference_update(self, other):
+        chunks = self.chunks
+        for key, bits in other.chunks.items():
+            if key in chunks:
+                bits = chunks[key] & ~bits
+                if bits:
+                    chunks[key] = bits
+                else:
+                    del chunks[key]
+
+    def difference(self, other):
+        """
+        Return the hexes in this set but not in the other one.
+        """
+        chunks = {}
+        for key, bits in self.chunks.items():
+            bits &= ~other.chunks.get(key, 0)
+            if bits:
+                chunks[key] = bits
+
+        return HexBits(chunks)
+
+    def clear(self):
+        self.chunks = {}
+
+    def to_bytes(self):
+        return b"".join(CHUNK_RECORD.pack(chunk_row, chunk_column,
+                                          bits.to_bytes(CHUNK_BYTES,
+                                                        "little"))
+                        for (chunk_row, chunk_column), bits
+                        in sorted(self.chunks.items()))
+
+    @classmethod
+    def from_bytes(cls, data):
+        chunks = {}
+        for chunk_row, chunk_column, bits in CHUNK_RECORD.iter_unpack(data):
+            chunks[chunk_row, chunk_column] = int.from_bytes(bits, "little")
+
+        return cls(chunks)
+
+
+class Exploration:
+    """
+    The explored and the currently visible hexes of a world.
+    """
+
+    def __init__(self):
+        self.explored = HexBits()
+        self.visible = HexBits()
+
+    def is_explored(self, row, column):
+        return (row, column) in self.explored
+
+    def see(self, hexes):
+        """
+        Make these hexes, such as a field of view, the visible ones, and
+        explore them. Returns the newly explored hexes as a HexBits.
+        """
+        self.visible = HexBits(get_masks(hexes))
+        new = self.visible.difference(self.explored)
+        self.explored.union_update(new)
+
+        return new
+
+    def reveal(self, row, column, radius):
+        """
+        Explore every hex within radius steps. Returns the newly explored
+        hexes as a HexBits.
+        """
+        new = HexBits(get_masks(hex for hex in get_spiral(row, column, radius)
+                                if hex[0] >= 0 and hex[1] >= 0))
+        new = new.difference(self.explored)
+        self.explored.union_update(new)
+
+        return new
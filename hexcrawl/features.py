@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""
+Finding point features, such as towns, without scanning the world.
+
+Features are kept in buckets, one per CHUNK_ROWS * CHUNK_COLUMNS block
+of hexes, each a sorted list of (row, column). A bucket is filled the
+first time a query touches its block, by scanning that block's flags in
+bulk, so queries only ever cost as much as the blocks they cover, and
+worlds without edges work too. Changes to single hexes are passed on
+with update, which keeps the buckets current without rescanning.
+"""
+
+import heapq
+from bisect import bisect_left, insort
+
+from .coords import get_distance
+from .world import CHUNK_COLUMNS, CHUNK_ROWS, TOWN
+
+
+class FeatureIndex:
+
+    def __init__(self, world, flag=TOWN):
+        self.world = world
+        self.flag = flag
+        # Turns flags into 1 where the feature is, and 0 elsewhere.
+        self.table = bytes(1 if value & flag else 0 for value in range(256))
+        self.buckets = {}
+
+    def get_bucket(self, chunk_row, chunk_column):
+        key = (chunk_row, chunk_column)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = self.scan(chunk_row, chunk_column)
+
+        return bucket
+
+    def scan(self, chunk_row, chunk_column):
+        """
+        Return the sorted features of one block, read from the world.
+        """
+        world = self.world
+        row = chunk_row * CHUNK_ROWS
+        column = chunk_column * CHUNK_COLUMNS
+        if row < 0 or column < 0:
+            return []
+        rows = CHUNK_ROWS
+        columns = CHUNK_COLUMNS
+        if world.rows is not None:
+            rows = min(rows, world.rows - row)
+        if world.columns is not None:
+            columns = min(columns, world.columns - column)
+        if rows <= 0 or columns <= 0:
+            return []
+
+        found = world.read_region(row, column, rows, columns)[1]
+        found = found.translate(self.table)
+        features = []
+        index = found.find(1)
+        while index != -1:
+            local_row, local_column = divmod(index, columns)
+            features.append((row + local_row, column + local_column))
+            index = found.find(1, index + 1)
+
+        return features
+
+    def update(self, row, column):
+        """
+        Bring the index up to date after the hex at row, column changed.
+        """
+        bucket = self.buckets.get((row // CHUNK_ROWS,
+                                   column // CHUNK_COLUMNS))
+        if bucket is None:
+            # Not scanned yet, so it will be read as it is now anyway.
+            return
+
+        point = (row, column)
+        pos = bisect_left(bucket, point)
+        present = pos < len(bucket) and bucket[pos] == point
+        if self.world.get_flags(row, column) & self.flag:
+            if not present:
+                insort(bucket, point)
+        elif present:
+            del bucket[pos]
+
+    def in_rect(self, top, left, bottom, right):
+        """
+        Return the features with top <= row < bottom and left <= column
+        < right, sorted by row and column.
+        """
+        found = []
+        for chunk_row in range(top // CHUNK_ROWS,
+                               -(-bottom // CHUNK_ROWS)):
+            row_found = []
+            for chunk_column in range(left // CHUNK_COLUMNS,
+                                      -(-right // CHUNK_COLUMNS)):
+                bucket = self.get_bucket(chunk_row, chunk_column)
+                start = bisect_left(bucket, (top,))
+                end = bisect_left(bucket, (bottom,))
+                row_found.extend(point for point in bucket[start:end]
+                                 if left <= point[1] < right)
+            row_found.sort()
+            found.extend(row_found)
+
+        return found
+
+    def in_radius(self, row, column, radius):
+        """
+        Return the features at most radius steps from row, column, as
+        (distance, row, column), nearest first.
+        """
+        found = []
+        for point in self.in_rect(row - radius, column - radius,
+                                  row + radius + 1, column + radius + 1):
+            distance = get_distance(row, column, *point)
+            if distance <= radius:
+                found.append((distance,) + point)
+        found.sort()
+
+        return found
+
+    def nearest(self, row, column, count=1, max_distance=None):
+        """
+        Return up to count features nearest to row, column, as
+        (distance, row, column), nearest first. Blocks are searched in
+        rings around the hex's own block until no unsearched block can
+        hold anything closer. A world without edges needs a max_distance.
+        """
+        world = self.world
+        center_row = row // CHUNK_ROWS
+        center_column = column // CHUNK_COLUMNS
+        if world.rows is not None and world.columns is not None:
+            last_ring = max(center_row, center_column,
+                            -(-world.rows // CHUNK_ROWS) - center_row,
+                            -(-world.columns // CHUNK_COLUMNS) -
+                            center_column)
+        elif max_distance is None:
+            raise ValueError("Can't search a world without edges "
+                             "without a max_distance")
+        else:
+            last_ring = None
+
+        best = []
+        ring = 0
+        while True:
+            # Hexes in this ring are at least ring - 1 whole blocks away
+            # in rows or columns, and so at least two thirds of that
+            # many steps away.
+            closest = max((ring - 1) * min(CHUNK_ROWS, CHUNK_COLUMNS) *
+                          2 // 3, 0)
+            if max_distance is not None and closest > max_distance:
+                break
+            if len(best) == count and -best[0][0] < closest:
+                break
+            if last_ring is not None and ring > last_ring:
+                break
+
+            for chunk_row, chunk_column in get_ring(center_row,
+                                                    center_column, ring):
+                for point in self.get_bucket(chunk_row, chunk_column):
+                    distance = get_distance(row, column, *point)
+                    if max_distance is not None and distance > max_distance:
+                        continue
+                    # A max-heap on distance, then position, of the best.
+                    entry = (-distance, -point[0], -point[1])
+                    if len(best) < count:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+            ring += 1
+
+        return sorted((-distance, -row, -column)
+                      for distance, row, column in best)
+
+
+def get_ring(row, column, ring):
+    """
+    Return the blocks ring steps away from block row, column, counting
+    diagonal steps, so each ring is the outline of a square.
+    """
+    if ring == 0:
+        return [(row, column)]
+
+    blocks = []
+    for offset in range(-ring, ring + 1):
+        blocks.append((row - ring, column + offset))
+        blocks.append((row + ring, column + offset))
+    for offset in range(-ring + 1, ring):
+        blocks.append((row + offset, column - ring))
+        blocks.append((row + offset, column + ring))
+
+    return blocks
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Field of view.
+
+A hex can be seen from an origin if the straight line between them
+doesn't pass through an opaque hex on the way. Opaque hexes themselves
+can be seen, so the edge of a forest is visible but not what is behind
+it.
+
+Lines are the same for every origin when measured in axial coordinates,
+so for each radius they are traced once, as positions in the spiral of
+hexes around the origin. Working out a field of view is then only a
+matter of looking up which of those positions are opaque. Results are
+cached per origin and radius, and dropped again when terrain within
+their range changes.
+"""
+
+from collections import OrderedDict
+
+from .coords import from_axial, get_distance, get_line, get_spiral, to_axial
+from .world import TERRAINS
+
+# Terrain that can't be seen through.
+OPACITY = {
+    ".": False,
+    "g": False,
+    "F": True,
+    "~": False,
+}
+
+SIGHT_RADIUS = 6
+MAX_CACHED = 256
+
+# By radius: the spiral as axial offsets, and for each of its hexes the
+# spiral positions the line to it passes through.
+sight_lines = {}
+
+
+def get_sight_lines(radius):
+    lines = sight_lines.get(radius)
+    if lines is None:
+        # Axial offsets equal offset coordinates around hex 0,0.
+        offsets = [to_axial(*hex) for hex in get_spiral(0, 0, radius)]
+        positions = {offset: pos for pos, offset in enumerate(offsets)}
+        between = []
+        for offset in offsets:
+            line = get_line(0, 0, *from_axial(*offset))
+            between.append(tuple(positions[to_axial(*hex)]
+                                 for hex in line[1:-1]))
+        lines = sight_lines[radius] = (offsets, between)
+
+    return lines
+
+
+class FieldOfView:
+
+    def __init__(self, world, opacity=OPACITY, max_cached=MAX_CACHED):
+        self.world = world
+        # Turns terrain codes into 1 for opaque, and 0 otherwise.
+        self.opaque = bytes(1 if code < len(TERRAINS) and
+                            opacity.get(TERRAINS[code]) else 0
+                            for code in range(256))
+        self.max_cached = max_cached
+        self.cache = OrderedDict()
+
+    def get_visible(self, row, column, radius=SIGHT_RADIUS):
+        """
+        Return the set of (row, column) that can be seen from row, column
+        within radius steps.
+        """
+        key = (row, column, radius)
+        visible = self.cache.get(key)
+        if visible is not None:
+            self.cache.move_to_end(key)
+            return visible
+
+        visible = self.cache[key] = self.compute(row, column, radius)
+        while len(self.cache) > self.max_cached:
+            self.cache.popitem(last=False)
+
+        return visible
+
+    def compute(self, row, column, radius):
+        world = self.world
+        offsets, between = get_sight_lines(radius)
+
+        # Read the terrain around the origin in one go.
+        top = max(row - radius, 0)
+        left = max(column - radius, 0)
+        bottom = row + radius + 1
+        right = column + radius + 1
+        if world.rows is not None:
+            bottom = min(bottom, world.rows)
+        if world.columns is not None:
+            right = min(right, world.columns)
+        width = right - left
+        terrain = world.read_region(top, left, bottom - top, width)[0]
+        opaque = terrain.translate(self.opaque)
+
+        # Which spiral positions are on the map, and which block sight.
+        q, r = to_axial(row, column)
+        hexes = []
+        blocked = bytearray()
+        for q_offset, r_offset in offsets:
+            hex_row, hex_column = from_axial(q + q_offset, r + r_offset)
+            if top <= hex_row < bottom and left <= hex_column < right:
+                hexes.append((hex_row, hex_column))
+                blocked.append(opaque[(hex_row - top) * width +
+                                      hex_column - left])
+            else:
+                hexes.append(None)
+                blocked.append(1)
+
+        visible = set()
+        for pos, hex in enumerate(hexes):
+            if hex is None:
+                continue
+            for other in between[pos]:
+                if blocked[other]:
+                    break
+            else:
+                visible.add(hex)
+
+        return frozenset(visible)
+
+    def invalidate(self, row, column):
+        """
+        Forget every cached field of view that the hex at row, column is
+        within range of, after its terrain changed.
+        """
+        for key in [key for key in self.cache
+                    if get_distance(key[0], key[1], row, column) <= key[2]]:
+            del self.cache[key]
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""
+Seeded terrain generation.
+
+Whole regions are rolled in one go: random bytes are drawn in bulk and
+mapped onto terrain codes and town flags with bytes.translate(), so the
+per-hex work happens in C rather than in a Python loop. The same seed
+and region always give the same result.
+
+TerrainGenerator rolls every hex on its own. NoiseGenerator instead
+derives terrain from smooth elevation and moisture fields, giving lakes,
+forests and open plains, and gives the same hexes no matter how the
+world is split into regions.
+"""
+
+import random
+
+from .noise import ValueNoise, add
+from .world import (CHUNK_COLUMNS, CHUNK_ROWS, FOREST, GRASS, PLAIN, TOWN,
+                    WATER, World)
+
+# Marks random bytes that would skew the distribution. They are rerolled.
+REJECT = 0xff
+
+# 3/7 forest, 2/7 grass, 1/7 water and 1/7 plain, as 252 = 7 * 36 bytes.
+TERRAIN_TABLE = bytes((FOREST, FOREST, FOREST, GRASS, GRASS, WATER, PLAIN) *
+                      36 + (REJECT,) * 4)
+
+# A 1 in 10 chance of a town, as 250 = 10 * 25 bytes.
+TOWN_TABLE = bytes((TOWN,) + (0,) * 9) * 25 + bytes((REJECT,) * 6)
+
+# Masks out the flags of water hexes, since towns can't be built there.
+LAND_MASK = bytes(0 if terrain == WATER else 0xff for terrain in range(256))
+
+# Noise levels, from 0 to 190, splitting the terrain up roughly as the
+# random tables do: water below WATER_LEVEL elevation, and otherwise
+# plains below DRY_LEVEL moisture and forest from WET_LEVEL up.
+WATER_LEVEL = 60
+DRY_LEVEL = 62
+WET_LEVEL = 92
+# Elevation to WATER for water, and to 0 otherwise, to be OR'ed in.
+WATER_TABLE = bytes(WATER if level < WATER_LEVEL else 0
+                    for level in range(256))
+# Moisture to the terrain of land.
+LAND_TABLE = bytes(PLAIN if level < DRY_LEVEL else
+                   GRASS if level < WET_LEVEL else FOREST
+                   for level in range(256))
+
+
+def roll(rng, count, table):
+    """
+    Return count random bytes mapped through a 256 byte translation
+    table, rerolling any that map to REJECT.
+    """
+    values = bytearray(rng.randbytes(count).translate(table))
+    pos = values.find(REJECT)
+    while pos != -1:
+        value = table[rng.getrandbits(8)]
+        if value != REJECT:
+            values[pos] = value
+            pos = values.find(REJECT, pos + 1)
+
+    return values
+
+
+def mask(values, masks):
+    """
+    Return the bytewise AND of two equally long byte strings.
+    """
+    length = len(values)
+    combined = int.from_bytes(values, "little") & \
+        int.from_bytes(masks, "little")
+
+    return bytearray(combined.to_bytes(length, "little"))
+
+
+def combine(values, other):
+    """
+    Return the bytewise OR of two equally long byte strings.
+    """
+    length = len(values)
+    combined = int.from_bytes(values, "little") | \
+        int.from_bytes(other, "little")
+
+    return bytearray(combined.to_bytes(length, "little"))
+
+
+class TerrainGenerator:
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+
+    def get_rng(self, row, column):
+        """
+        Return a random generator for the region whose top left hex is
+        at row, column. It only depends on the seed and the position.
+        """
+        return random.Random(f"{self.seed}:{row}:{column}")
+
+    def generate(self, row, column, rows, columns):
+        """
+        Generate a region of rows * columns hexes. Returns the terrain
+        and flags arrays, in row major order.
+        """
+        rng = self.get_rng(row, column)
+        count = rows * columns
+        terrain = roll(rng, count, TERRAIN_TABLE)
+        flags = roll(rng, count, TOWN_TABLE)
+        flags = mask(flags, terrain.translate(LAND_MASK))
+
+        return terrain, flags
+
+    def fill(self, world):
+        """
+        Generate every hex in a world.
+        """
+        terrain, flags = self.generate(0, 0, world.rows, world.columns)
+        world.write_region(0, 0, world.rows, world.columns, terrain, flags)
+
+
+class NoiseGenerator:
+    """
+    Terrain from two octaves each of elevation and moisture noise. Low
+    ground is water, and the rest goes from plains to grassland to
+    forest as it gets wetter.
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.elevation = (ValueNoise(seed, "elevation", 16, 127),
+                          ValueNoise(seed, "elevation detail", 4, 63))
+        self.moisture = (ValueNoise(seed, "moisture", 16, 127),
+                         ValueNoise(seed, "moisture detail", 8, 63))
+
+    def __reduce__(self):
+        # Everything else follows from the seed, and is cheaper to build
+        # again than to pickle.
+        return NoiseGenerator, (self.seed,)
+
+    def get_field(self, octaves, row, column, rows, columns):
+        values = octaves[0].sample(row, column, rows, columns)
+        for octave in octaves[1:]:
+            values = add(values, octave.sample(row, column, rows, columns))
+
+        return values
+
+    def get_towns(self, row, column, rows, columns):
+        """
+        Roll towns in whole chunks, seeded by chunk, so that they don't
+        depend on the region either.
+        """
+        top = row // CHUNK_ROWS
+        left = column // CHUNK_COLUMNS
+        bottom = -(-(row + rows) // CHUNK_ROWS)
+        right = -(-(column + columns) // CHUNK_COLUMNS)
+        if (bottom - top, right - left) == (1, 1) and \
+                (rows, columns) == (CHUNK_ROWS, CHUNK_COLUMNS):
+            rng = random.Random(f"{self.seed}:towns:{top}:{left}")
+            return roll(rng, rows * columns, TOWN_TABLE)
+
+        chunks = World((bottom - top) * CHUNK_ROWS,
+                       (right - left) * CHUNK_COLUMNS)
+        for chunk_row in range(top, bottom):
+            for chunk_column in range(left, right):
+                chunks.write_region((chunk_row - top) * CHUNK_ROWS,
+                                    (chunk_column - left) * CHUNK_COLUMNS,
+                                    CHUNK_ROWS, CHUNK_COLUMNS,
+                                    self.get_towns(
+                                        chunk_row * CHUNK_ROWS,
+                                        chunk_column * CHUNK_COLUMNS,
+                                        CHUNK_ROWS, CHUNK_COLUMNS),
+                                    bytes(CHUNK_ROWS * CHUNK_COLUMNS))
+
+        return chunks.read_region(row - top * CHUNK_ROWS,
+                                  column - left * CHUNK_COLUMNS,
+                                  rows, columns)[0]
+
+    def generate(self, row, column, rows, columns):
+        """
+        Generate a region of rows * columns hexes. Returns the terrain
+        and flags arrays, in row major order.
+        """
+        elevation = self.get_field(self.elevation, row, column, rows,
+                                   columns)
+        moisture = self.get_field(self.moisture, row, column, rows, columns)
+        terrain = combine(moisture.translate(LAND_TABLE),
+                          elevation.translate(WATER_TABLE))
+        flags = self.get_towns(row, column, rows, columns)
+        flags = mask(flags, terrain.translate(LAND_MASK))
+
+        return terrain, flags
+
+    def fill(self, world):
+        """
+        Generate every hex in a world.
+        """
+        terrain, flags = self.generate(0, 0, world.rows, world.columns)
+        world.write_region(0, 0, world.rows, world.columns, terrain, flags)
+
+
+GENERATORS = {
+    "noise": NoiseGenerator,
+    "random": TerrainGenerator,
+}
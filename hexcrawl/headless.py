@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+"""
+A headless stand-in for curses.
+
+HeadlessBackend provides the parts of the curses module that the TUI
+uses, and hands out windows and pads that draw into in-memory character
+and attribute buffers instead of onto a terminal. Refreshing a window
+copies it onto the backend's screen buffer, so what the user would see
+can be inspected, and every call is counted.
+"""
+
+import curses
+
+
+class Stats:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.addstr_calls = 0
+        self.chars_written = 0
+        self.refresh_calls = 0
+        # Sent to a terminal, by backends that have one.
+        self.bytes_written = 0
+
+
+class HeadlessWindow:
+
+    def __init__(self, backend, rows, columns, begin_row=0, begin_column=0,
+                 is_pad=False):
+        self.backend = backend
+        self.begin_row = begin_row
+        self.begin_column = begin_column
+        self.is_pad = is_pad
+        self.cursor_row = 0
+        self.cursor_column = 0
+        self.scroll_ok = False
+        self.keys = backend.keys
+        self.resize(rows, columns)
+
+    def resize(self, rows, columns):
+        old_chars = getattr(self, "chars", [])
+        old_attrs = getattr(self, "attrs", [])
+        self.rows = rows
+        self.columns = columns
+        self.chars = [[" "] * columns for row in range(rows)]
+        self.attrs = [[0] * columns for row in range(rows)]
+        for row in range(min(rows, len(old_chars))):
+            width = min(columns, len(old_chars[row]))
+            self.chars[row][:width] = old_chars[row][:width]
+            self.attrs[row][:width] = old_attrs[row][:width]
+        self.cursor_row = min(self.cursor_row, rows - 1)
+        self.cursor_column = min(self.cursor_column, columns - 1)
+
+    def mvwin(self, row, column):
+        self.begin_row = row
+        self.begin_column = column
+
+    def getmaxyx(self):
+        return self.rows, self.columns
+
+    def addstr(self, *args):
+        if len(args) >= 3:
+            row, column, text = args[:3]
+            attr = args[3] if len(args) > 3 else 0
+            if not (0 <= row < self.rows and 0 <= column < self.columns):
+                raise curses.error("addwstr() returned ERR")
+            self.cursor_row = row
+            self.cursor_column = column
+        else:
+            text = args[0]
+            attr = args[1] if len(args) > 1 else 0
+
+        stats = self.backend.stats
+        stats.addstr_calls += 1
+        stats.chars_written += len(text)
+        for char in text:
+            if char == "\n":
+                self.clear_to_eol()
+                self.newline()
+                continue
+            self.chars[self.cursor_row][self.cursor_column] = char
+            self.attrs[self.cursor_row][self.cursor_column] = attr
+            self.cursor_column += 1
+            if self.cursor_column == self.columns:
+                self.newline()
+
+    def newline(self):
+        self.cursor_column = 0
+        if self.cursor_row < self.rows - 1:
+            self.cursor_row += 1
+        elif self.scroll_ok:
+            del self.chars[0]
+            del self.attrs[0]
+            self.chars.append([" "] * self.columns)
+            self.attrs.append([0] * self.columns)
+        else:
+            self.cursor_column = self.columns - 1
+            raise curses.error("addwstr() returned ERR")
+
+    def clear_to_eol(self):
+        row = self.cursor_row
+        for column in range(self.cursor_column, self.columns):
+            self.chars[row][column] = " "
+            self.attrs[row][column] = 0
+
+    def clear(self):
+        for row in range(self.rows):
+            self.chars[row] = [" "] * self.columns
+            self.attrs[row] = [0] * self.columns
+        self.cursor_row = 0
+        self.cursor_column = 0
+
+    erase = clear
+
+    def instr(self, row, column, length):
+        return "".join(self.chars[row][column:column + length]).encode()
+
+    def inch(self, row, column):
+        return ord(self.chars[row][column]) | self.attrs[row][column]
+
+    def overwrite(self, dest, source_row, source_column, dest_row,
+                  dest_column, dest_max_row, dest_max_column):
+        # Clip to both windows, as curses does.
+        width = min(dest_max_column - dest_column + 1,
+                    self.columns - source_column, dest.columns - dest_column)
+        height = min(dest_max_row - dest_row + 1,
+                     self.rows - source_row, dest.rows - dest_row)
+        for offset in range(height):
+            row = source_row + offset
+            target = dest_row + offset
+            dest.chars[target][dest_column:dest_column + width] = \
+                self.chars[row][source_column:source_column + width]
+            dest.attrs[target][dest_column:dest_column + width] = \
+                self.attrs[row][source_column:source_column + width]
+
+    def refresh(self, *args):
+        self.noutrefresh(*args)
+        self.backend.doupdate()
+
+    def noutrefresh(self, *args):
+        if self.is_pad:
+            source_row, source_column, top, left, bottom, right = args
+        else:
+            source_row = source_column = 0
+            top = self.begin_row
+            left = self.begin_column
+            bottom = top + self.rows - 1
+            right = left + self.columns - 1
+        self.overwrite(self.backend.screen, source_row, source_column,
+                       top, left, bottom, right)
+
+    def getch(self):
+        if self.keys:
+            return self.keys.pop(0)
+        return curses.ERR
+
+    def scrollok(self, flag):
+        self.scroll_ok = flag
+
+    def touchwin(self):
+        pass
+
+    def keypad(self, flag):
+        pass
+
+    def timeout(self, delay):
+        pass
+
+    def nodelay(self, flag):
+        pass
+
+
+class HeadlessBackend:
+    """
+    Drop-in for the curses module, for the parts the TUI needs.
+    """
+
+    def __init__(self, rows=50, columns=160):
+        self.stats = Stats()
+        self.keys = []
+        self.pairs = {}
+        self.terminal = False
+        self.screen = self.newwin(rows, columns)
+
+    def newwin(self, rows, columns, begin_row=0, begin_column=0):
+        return HeadlessWindow(self, rows, columns, begin_row, begin_column)
+
+    def newpad(self, rows, columns):
+        return HeadlessWindow(self, rows, columns, is_pad=True)
+
+    def init_pair(self, pair, foreground, background):
+        self.pairs[pair] = (foreground, background)
+
+    def color_pair(self, pair):
+        return pair << 8
+
+    def doupdate(self):
+        self.stats.refresh_calls += 1
+
+    def resize(self, rows, columns):
+        """
+        Resize the screen and queue a KEY_RESIZE, like a terminal would.
+        """
+        self.screen.resize(rows, columns)
+        self.keys.append(curses.KEY_RESIZE)
+
+    def get_screen_text(self):
+        return ["".join(row) for row in self.screen.chars]
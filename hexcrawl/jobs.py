@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+Background jobs.
+
+Slow work, like generating chunks before they scroll into view, finding
+routes and saving, runs on a worker thread while the event loop goes on
+reading keys and drawing. A job's work only gets data nothing else
+touches, such as a copy of part of the world, and its result is handed
+back to the event loop, which applies it between frames.
+
+Jobs run in lanes, each with workers of its own, so that a long job in
+one lane, like saving a big world, doesn't hold up the chunks and routes
+queued in another.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+WORKERS = 1
+
+
+class Jobs:
+
+    def __init__(self, workers=WORKERS, on_error=None):
+        self.workers = workers
+        # One executor per lane, made when the lane is first used.
+        self.executors = {}
+        # Called with the key and the exception when a job fails.
+        self.on_error = on_error
+        self.running = {}
+
+    def __contains__(self, key):
+        return key in self.running
+
+    def __len__(self):
+        return len(self.running)
+
+    def start(self, key, work, done, *args, lane=None):
+        """
+        Run work(*args) on a worker of the given lane, and then
+        done(result) on the event loop. Returns False, and does nothing,
+        if a job with this key is already running.
+        """
+        if key in self.running:
+            return False
+
+        executor = self.executors.get(lane)
+        if executor is None:
+            executor = ThreadPoolExecutor(self.workers)
+            self.executors[lane] = executor
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, work, *args)
+        self.running[key] = future
+
+        def finished(future):
+            del self.running[key]
+            if future.cancelled():
+                return
+            try:
+                result = future.result()
+            except Exception as error:
+                if not self.on_error:
+                    raise
+                self.on_error(key, error)
+                return
+            done(result)
+
+        future.add_done_callback(finished)
+        return True
+
+    def shutdown(self):
+        """
+        Drop the jobs that haven't started, and wait for the rest.
+        """
+        for future in self.running.values():
+            future.cancel()
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+"""
+Binary world files.
+
+A world file is a fixed header followed by the terrain array and then
+the flags array, one byte per hex each, in row major order:
+
+    magic    4 bytes   b"HEXC"
+    version  uint16
+    (unused) uint16
+    rows     uint32
+    columns  uint32
+    seed     uint64
+
+All numbers are little endian. Loading maps the file into memory
+instead of reading it, so only the parts of the world that are actually
+looked at are ever read from disk.
+"""
+
+import mmap
+import os
+import struct
+
+from .world import CHUNK_ROWS, World
+
+MAGIC = b"HEXC"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIQ")
+
+
+class MapWriter:
+    """
+    Writes a world file a band of rows at a time, so the whole world
+    never has to be in memory at once.
+    """
+
+    def __init__(self, path, rows, columns, seed=0):
+        if not 0 <= seed < 2 ** 64:
+            raise ValueError(f"Seed {seed} doesn't fit in a world file")
+        self.rows = rows
+        self.columns = columns
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, rows, columns, seed))
+        # Make the file full size up front, so bands can go anywhere.
+        self.file.truncate(HEADER.size + rows * columns * 2)
+
+    def write_rows(self, row, terrain, flags):
+        """
+        Write whole rows of terrain and flags, starting at row.
+        """
+        start = row * self.columns
+        self.file.seek(HEADER.size + start)
+        self.file.write(terrain)
+        self.file.seek(HEADER.size + self.rows * self.columns + start)
+        self.file.write(flags)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class MappedWorld(World):
+    """
+    A World whose arrays live in a memory mapped world file. Changes are
+    kept in memory and not written back to the file, unless it is opened
+    as writable.
+    """
+
+    def __init__(self, path, writable=False):
+        if writable:
+            self.file = open(path, "r+b")
+            access = mmap.ACCESS_WRITE
+        else:
+            self.file = open(path, "rb")
+            access = mmap.ACCESS_COPY
+        # Checked before mapping it, since an empty file can't be mapped.
+        if os.fstat(self.file.fileno()).st_size < HEADER.size:
+            self.file.close()
+            raise ValueError(f"{path} is not a world file")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=access)
+        magic, version, unused, rows, columns, seed = \
+            HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a world file")
+        if not 1 <= version <= VERSION:
+            self.close()
+            raise ValueError(f"{path} has unsupported version {version}")
+        if len(self.map) < HEADER.size + rows * columns * 2:
+            self.close()
+            raise ValueError(f"{path} is too short for a {rows}x{columns} "
+                             "world")
+
+        self.rows = rows
+        self.columns = columns
+        self.seed = seed
+        self.listeners = []
+        size = rows * columns
+        view = memoryview(self.map)
+        self.terrain = view[HEADER.size:HEADER.size + size]
+        self.flags = view[HEADER.size + size:HEADER.size + size * 2]
+        view.release()
+
+    def close(self):
+        if hasattr(self, "terrain"):
+            self.terrain.release()
+            self.flags.release()
+        self.map.close()
+        self.file.close()
+
+
+def save_world(world, path, seed=0):
+    """
+    Write any world with a known size to a file, CHUNK_ROWS rows at a
+    time.
+    """
+    if world.rows is None or world.columns is None:
+        raise ValueError("Can't save a world without edges")
+
+    with MapWriter(path, world.rows, world.columns, seed) as writer:
+        for row in range(0, world.rows, CHUNK_ROWS):
+            rows = min(CHUNK_ROWS, world.rows - row)
+            terrain, flags = world.read_region(row, 0, rows, world.columns)
+            writer.write_rows(row, terrain, flags)
+
+
+def replace_file(path, write):
+    """
+    Call write(temp_path) to write a file next to path, and then
+    move it over path. A world mapped from path, even the one being
+    saved, is never written into, and path is never left half written.
+    """
+    # Created by write, so it gets the usual permissions.
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_world(path):
+    return MappedWorld(path)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""
+The message log shown in the info window.
+
+Messages go into a ring buffer holding the last MAX_MESSAGES of them,
+and nothing is written to the screen when they are added. Once per
+frame the window is redrawn from the buffer, if anything changed, so a
+burst of messages costs one redraw, and the log can be drawn again at
+any time, like after the window is recreated, or scrolled back through.
+"""
+
+import curses
+from collections import deque
+
+MAX_MESSAGES = 500
+
+
+def wrap(text, columns):
+    """
+    Return text broken into lines of at most columns characters.
+    """
+    return [text[start:start + columns]
+            for start in range(0, len(text), columns)] or [""]
+
+
+class MessageLog:
+
+    def __init__(self, max_messages=MAX_MESSAGES):
+        self.messages = deque(maxlen=max_messages)
+        # How many lines back from the newest the view is scrolled.
+        self.scroll = 0
+        # Whether the window needs drawing again.
+        self.changed = True
+
+    def add(self, text):
+        self.messages.append(text)
+        # New messages bring the view back down to them.
+        self.scroll = 0
+        self.changed = True
+
+    def scroll_by(self, lines):
+        """
+        Scroll back through older messages by lines, or forward again if
+        lines is negative.
+        """
+        scroll = max(self.scroll + lines, 0)
+        if scroll != self.scroll:
+            self.scroll = scroll
+            self.changed = True
+
+    def get_lines(self, rows, columns):
+        """
+        Return the lines to show in a window of rows * columns, oldest
+        first. Only the messages that end up in view are wrapped.
+        """
+        needed = rows + self.scroll
+        lines = []
+        for text in reversed(self.messages):
+            lines.extend(reversed(wrap(text, columns)))
+            if len(lines) >= needed:
+                break
+
+        # Don't scroll back past the oldest message.
+        self.scroll = min(self.scroll, max(len(lines) - rows, 0))
+        lines = lines[self.scroll:self.scroll + rows]
+        lines.reverse()
+
+        return lines
+
+    def draw(self, win):
+        """
+        Draw the log onto a window, top aligned like a scrolling log.
+        """
+        rows, columns = win.getmaxyx()
+        win.erase()
+        for row, line in enumerate(self.get_lines(rows, columns)):
+            try:
+                win.addstr(row, 0, line)
+            except curses.error:
+                # A full last line moves the cursor off the window, after
+                # writing it.
+                pass
+        self.changed = False
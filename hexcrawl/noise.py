@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+Coherent value noise over the hex grid.
+
+Random values are placed on a square lattice of hexes, every spacing
+rows and columns, and smoothly interpolated in between. Each hex is
+sampled at its centre, so odd columns, which sit half a hex lower, are
+sampled half a row further down.
+
+Values are single bytes and are interpolated with lookup tables rather
+than per hex arithmetic: between two lattice points a row of hexes is
+one precomputed run of bytes, picked by the two end values, and whole
+rows are built by joining those runs. Everything about a hex depends
+only on the seed and the lattice points around it, so any region can be
+generated on its own and always matches its neighbours.
+"""
+
+import random
+
+# Lattice values are below this, so that two of them index a table.
+LEVELS = 128
+# Lattice values are drawn this many lattice columns at a time.
+LATTICE_BLOCK = 32
+# Interpolation weights are fixed point, 0 to 1 << WEIGHT_BITS.
+WEIGHT_BITS = 8
+
+# Interpolated runs of bytes by spacing, indexed by start * LEVELS + end.
+segments = {}
+
+
+def get_weights(steps):
+    """
+    Return smoothstep weights for positions 0 to steps - 1 of the way
+    from one lattice point to the next, in fixed point.
+    """
+    weights = []
+    for step in range(steps):
+        t = step / steps
+        weights.append(round(t * t * (3 - 2 * t) * (1 << WEIGHT_BITS)))
+
+    return weights
+
+
+def get_segments(spacing):
+    table = segments.get(spacing)
+    if table is None:
+        weights = get_weights(spacing)
+        table = [bytes(start + ((end - start) * weight >> WEIGHT_BITS)
+                       for weight in weights)
+                 for start in range(LEVELS) for end in range(LEVELS)]
+        segments[spacing] = table
+
+    return table
+
+
+def add(values, other):
+    """
+    Return the bytewise sum of two equally long byte strings, which
+    must not add up to more than 255 anywhere.
+    """
+    length = len(values)
+    total = int.from_bytes(values, "little") + \
+        int.from_bytes(other, "little")
+
+    return total.to_bytes(length, "little")
+
+
+class ValueNoise:
+    """
+    One octave of noise with values from 0 to amplitude (below LEVELS),
+    and lattice points every spacing hexes.
+    """
+
+    def __init__(self, seed, name, spacing, amplitude):
+        self.seed = seed
+        self.name = name
+        self.spacing = spacing
+        # Scales random bytes down to 0 to amplitude.
+        self.scale = bytes(value * (amplitude + 1) >> 8
+                           for value in range(256))
+        self.row_weights = get_weights(spacing * 2)
+        self.segments = get_segments(spacing)
+
+    def get_lattice_row(self, lattice_row, first, count):
+        """
+        Return the values of count lattice points along a lattice row,
+        starting at lattice column first.
+        """
+        values = bytearray()
+        start = first % LATTICE_BLOCK
+        block = first // LATTICE_BLOCK
+        while len(values) < start + count:
+            rng = random.Random(f"{self.seed}:{self.name}:{lattice_row}:"
+                                f"{block}")
+            values += rng.randbytes(LATTICE_BLOCK)
+            block += 1
+
+        return values[start:start + count].translate(self.scale)
+
+    def sample(self, row, column, rows, columns):
+        """
+        Return the noise for a rows * columns region with its top left
+        hex at row, column, as one byte string in row major order.
+        """
+        spacing = self.spacing
+        segments = self.segments
+        row_weights = self.row_weights
+        first = column // spacing
+        count = -(-(column + columns) // spacing) - first + 1
+        cut = column - first * spacing
+        # Odd columns are sampled from the half row below.
+        odd = 1 - (column & 1)
+
+        lattice_rows = {}
+        values = bytearray()
+        for half_row in range(row * 2, (row + rows) * 2):
+            lattice_row, offset = divmod(half_row, spacing * 2)
+            for needed in (lattice_row, lattice_row + 1):
+                if needed not in lattice_rows:
+                    lattice_rows[needed] = \
+                        self.get_lattice_row(needed, first, count)
+            top = lattice_rows[lattice_row]
+            bottom = lattice_rows[lattice_row + 1]
+
+            weight = row_weights[offset]
+            column_values = [start + ((end - start) * weight >> WEIGHT_BITS)
+                             for start, end in zip(top, bottom)]
+            line = b"".join([segments[start * LEVELS + end]
+                             for start, end in zip(column_values,
+                                                   column_values[1:])])
+            line = line[cut:cut + columns]
+            if half_row & 1:
+                even_line[odd::2] = line[odd::2]
+                values += even_line
+            else:
+                even_line = bytearray(line)
+
+        return values
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+"""
+The zoomed out overview of the map.
+
+At zoom level n every character of the overview stands for a square of
+2 ** n by 2 ** n hexes, showing the terrain most of them have, or a
+town if more than a quarter of them are towns. Level 0 is one character
+per hex, and at MAX_LEVEL a character is a whole chunk.
+
+The summaries for all levels are worked out together, once per chunk,
+by adding up terrain counts two by two from the chunk's arrays, and are
+then kept as the characters to show. Drawing only slices bytes out of
+them, so switching levels and panning cost the same however much of the
+world is in view. With fog, chunks nobody has explored are left blank
+without being summarized at all.
+"""
+
+import curses
+from collections import OrderedDict
+from itertools import groupby
+
+from .world import CHUNK_COLUMNS, CHUNK_ROWS, TERRAINS, TOWN
+
+MAX_LEVEL = 5
+# Summaries kept, at least. The cache grows to hold everything in view.
+MAX_SUMMARIES = 4096
+# And room for this much more than is in view, for panning around.
+SUMMARY_MARGIN = 0.5
+# Chunks summarized per draw, at most. The rest of the view is filled in
+# over the following frames, so a far zoom doesn't hold up input.
+SUMMARIES_PER_DRAW = 64
+# The terrain code for hexes off the map.
+NONE = 255
+TOWN_GLYPH = "#"
+
+# By level, the bits of each cell in a chunk's exploration bits.
+cell_masks = {}
+
+
+def get_cell_masks(level):
+    masks = cell_masks.get(level)
+    if masks is None:
+        size = 1 << level
+        row_mask = (1 << size) - 1
+        masks = []
+        for cell_row in range(CHUNK_ROWS >> level):
+            for cell_column in range(CHUNK_COLUMNS >> level):
+                mask = 0
+                for row in range(cell_row * size, (cell_row + 1) * size):
+                    mask |= row_mask << (row * CHUNK_COLUMNS +
+                                         cell_column * size)
+                masks.append(mask)
+        masks = cell_masks[level] = masks
+
+    return masks
+
+
+def reduce(values, width, combine):
+    """
+    Combine each 2 by 2 block of a width by width grid of values into
+    one, giving a grid half as wide.
+    """
+    cells = []
+    for row in range(0, len(values), width * 2):
+        top = values[row:row + width]
+        bottom = values[row + width:row + width * 2]
+        cells.extend(map(combine, top[0::2], top[1::2], bottom[0::2],
+                         bottom[1::2]))
+
+    return cells
+
+
+def add(a, b, c, d):
+    return a + b + c + d
+
+
+def summarize(terrain, flags):
+    """
+    Return the summaries of a chunk, given its terrain and flags, as a
+    list with the terrain and town bytes for each level. A cell counts
+    as a town if more than a quarter of its hexes are.
+    """
+    towns = flags.translate(bytes(1 if value & TOWN else 0
+                                  for value in range(256)))
+    counts = [list(terrain.translate(bytes(1 if value == code else 0
+                                           for value in range(256))))
+              for code in range(len(TERRAINS))]
+    towns = list(towns)
+    levels = [(bytes(terrain), bytes(towns))]
+    width = CHUNK_COLUMNS
+    for level in range(1, MAX_LEVEL + 1):
+        counts = [reduce(values, width, add) for values in counts]
+        towns = reduce(towns, width, add)
+        width //= 2
+        dominant = bytearray()
+        for cell in zip(*counts):
+            most = max(cell)
+            dominant.append(cell.index(most) if most else NONE)
+        quarter = 1 << (level * 2 - 2)
+        levels.append((bytes(dominant),
+                       bytes(count > quarter for count in towns)))
+
+    return levels
+
+
+class Overview:
+
+    def __init__(self, world, palette, max_summaries=MAX_SUMMARIES):
+        self.world = world
+        self.max_summaries = max_summaries
+        self.capacity = max_summaries
+        self.summaries = OrderedDict()
+        # Summaries that may still be worked out in this draw.
+        self.budget = SUMMARIES_PER_DRAW
+        # Turns terrain codes into characters, and blanks what is off
+        # the map.
+        self.glyphs = bytearray(b" " * 256)
+        for code, terrain in enumerate(TERRAINS):
+            self.glyphs[code] = ord(terrain)
+        colors = {"F": palette.green, "g": palette.yellow, "~": palette.blue,
+                  ".": palette.white, TOWN_GLYPH: palette.white}
+        self.attrs = {ord(glyph): attr for glyph, attr in colors.items()}
+        self.selected_attr = palette.magenta_white
+
+    def get_size(self, chunk_row, chunk_column):
+        """
+        Return how many rows and columns of a chunk are on the map, or
+        None if none of it is.
+        """
+        world = self.world
+        row = chunk_row * CHUNK_ROWS
+        column = chunk_column * CHUNK_COLUMNS
+        rows = CHUNK_ROWS
+        columns = CHUNK_COLUMNS
+        if world.rows is not None:
+            rows = min(rows, world.rows - row)
+        if world.columns is not None:
+            columns = min(columns, world.columns - column)
+        if row < 0 or column < 0 or rows <= 0 or columns <= 0:
+            return None
+
+        return rows, columns
+
+    def get_summary(self, chunk_row, chunk_column):
+        """
+        Return the characters of a chunk at every level, or None if it is
+        off the map.
+        """
+        key = (chunk_row, chunk_column)
+        summary = self.summaries.get(key)
+        if summary is not None:
+            self.summaries.move_to_end(key)
+            return summary
+
+        size = self.get_size(chunk_row, chunk_column)
+        if not size:
+            return None
+        rows, columns = size
+        row = chunk_row * CHUNK_ROWS
+        column = chunk_column * CHUNK_COLUMNS
+        terrain, flags = self.world.read_region(row, column, rows, columns)
+        if rows < CHUNK_ROWS or columns < CHUNK_COLUMNS:
+            # Pad the edges of the map out to a whole chunk.
+            padding = bytes([NONE]) * (CHUNK_COLUMNS - columns)
+            terrain = b"".join(terrain[start:start + columns] + padding
+                               for start in range(0, len(terrain), columns))
+            terrain += bytes([NONE]) * (CHUNK_COLUMNS * (CHUNK_ROWS - rows))
+            padding = bytes(CHUNK_COLUMNS - columns)
+            flags = b"".join(flags[start:start + columns] + padding
+                             for start in range(0, len(flags), columns))
+            flags += bytes(CHUNK_COLUMNS * (CHUNK_ROWS - rows))
+
+        summary = []
+        for terrain, towns in summarize(bytes(terrain), bytes(flags)):
+            glyphs = bytearray(terrain.translate(self.glyphs))
+            town = towns.find(1)
+            while town != -1:
+                glyphs[town] = ord(TOWN_GLYPH)
+                town = towns.find(1, town + 1)
+            summary.append(bytes(glyphs))
+        self.summaries[key] = summary
+        while len(self.summaries) > self.capacity:
+            self.summaries.popitem(last=False)
+
+        return summary
+
+    def invalidate(self, row, column):
+        """
+        Forget the summaries of the chunk holding the hex at row, column,
+        after it changed.
+        """
+        self.summaries.pop((row // CHUNK_ROWS, column // CHUNK_COLUMNS),
+                           None)
+
+    def get_line(self, level, cell_row, cell_column, count, explored=None):
+        """
+        Return count characters of one line of the overview, starting at
+        the given cell, as bytes. Returns None instead if a summary it
+        needs hasn't been worked out yet and no more may be this draw.
+        """
+        width = CHUNK_COLUMNS >> level
+        chunk_row, local_row = divmod(cell_row, CHUNK_ROWS >> level)
+        mask_row = (1 << (CHUNK_COLUMNS << level)) - 1
+        mask_row <<= local_row * (CHUNK_COLUMNS << level)
+        line = bytearray()
+        while len(line) < count:
+            chunk_column, local_column = divmod(cell_column + len(line),
+                                                width)
+            length = min(width - local_column, count - len(line))
+            key = (chunk_row, chunk_column)
+            bits = None
+            if explored is not None:
+                bits = explored.chunks.get(key, 0) & mask_row
+                if not bits:
+                    line += b" " * length
+                    continue
+            if key not in self.summaries:
+                if not self.get_size(chunk_row, chunk_column):
+                    line += b" " * length
+                    continue
+                if self.budget <= 0:
+                    return None
+                self.budget -= 1
+            summary = self.get_summary(chunk_row, chunk_column)
+
+            start = local_row * width + local_column
+            glyphs = summary[level][start:start + length]
+            if bits is not None and bits != mask_row:
+                glyphs = bytearray(glyphs)
+                masks = get_cell_masks(level)[start:start + length]
+                for offset, mask in enumerate(masks):
+                    if not bits & mask:
+                        glyphs[offset] = ord(" ")
+            line += glyphs
+
+        return line
+
+    def draw(self, win, level, top, left, selected=None, explored=None):
+        """
+        Draw the overview onto a window, with the cell at top, left in
+        its top left corner. The cell holding the selected (row, column)
+        is highlighted, and with explored given, only explored cells are
+        shown. Returns False if parts are left blank because their
+        summaries still have to be worked out.
+        """
+        rows, columns = win.getmaxyx()
+        self.budget = SUMMARIES_PER_DRAW
+        # Never evict what is in view, or the view would never fill in.
+        cells = CHUNK_ROWS >> level
+        in_view = (-(-rows // cells) + 1) * (-(-columns // cells) + 1)
+        self.capacity = max(self.max_summaries,
+                            int(in_view * (1 + SUMMARY_MARGIN)))
+        complete = True
+        if selected:
+            selected = (selected[0] >> level, selected[1] >> level)
+
+        for y in range(rows):
+            line = self.get_line(level, top + y, left, columns, explored)
+            if line is None:
+                line = b" " * columns
+                complete = False
+            attrs = [self.attrs.get(char, 0) for char in line]
+            if selected and selected[0] == top + y and \
+                    0 <= selected[1] - left < columns:
+                attrs[selected[1] - left] = self.selected_attr
+            text = line.decode("ascii")
+            start = 0
+            for attr, run in groupby(attrs):
+                end = start + len(list(run))
+                try:
+                    win.addstr(y, start, text[start:end], attr)
+                except curses.error:
+                    # Writing the bottom right corner moves the cursor
+                    # off the window, after writing it.
+                    pass
+                start = end
+
+        return complete
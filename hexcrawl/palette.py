@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+"""
+Colour attributes.
+
+Everything that draws looks its colours up on a Palette instead of in
+module globals. A new Palette has every colour set to the plain
+attribute, 0, so hexes can be drawn before, or entirely without, a
+terminal. Calling setup once curses is running makes the colours real.
+"""
+
+import curses
+
+# Name, colour pair number, foreground and background.
+COLORS = (
+    ("white", 1, curses.COLOR_WHITE, curses.COLOR_BLACK),
+    ("blue", 2, curses.COLOR_BLUE, curses.COLOR_BLACK),
+    ("cyan", 3, curses.COLOR_CYAN, curses.COLOR_BLACK),
+    ("green", 4, curses.COLOR_GREEN, curses.COLOR_BLACK),
+    ("yellow", 5, curses.COLOR_YELLOW, curses.COLOR_BLACK),
+    ("magenta", 6, curses.COLOR_MAGENTA, curses.COLOR_BLACK),
+    ("red", 7, curses.COLOR_RED, curses.COLOR_BLACK),
+    ("cyan_blue", 9, curses.COLOR_CYAN, curses.COLOR_BLUE),
+    ("magenta_white", 10, curses.COLOR_MAGENTA, curses.COLOR_WHITE),
+)
+
+
+class Palette:
+
+    def __init__(self):
+        for name, pair, foreground, background in COLORS:
+            setattr(self, name, 0)
+
+    def setup(self, backend=curses):
+        """
+        Create the colour pairs with backend, the curses module or a
+        stand-in for it, and use them from now on.
+        """
+        for name, pair, foreground, background in COLORS:
+            backend.init_pair(pair, foreground, background)
+            setattr(self, name, backend.color_pair(pair))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Generating whole worlds on several processes.
+
+The world is generated in the same CHUNK_ROWS * CHUNK_COLUMNS regions as
+a ChunkedWorld uses, each seeded only by the world seed and its position,
+so the result doesn't depend on how the regions are spread over the
+processes and matches a ChunkedWorld with the same generator exactly.
+
+Every worker gets a band of one region row at a time and writes it
+straight into a memory mapped world file. Only the band number and the
+file name go between processes; no hex data is ever pickled.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .mapfile import MapWriter, MappedWorld
+from .world import CHUNK_COLUMNS, CHUNK_ROWS, World
+
+# Set in each worker process by start_worker.
+worker_generator = None
+
+
+def generate_band(generator, world, chunk_row):
+    """
+    Generate one row of regions into an open, writable world.
+    """
+    row = chunk_row * CHUNK_ROWS
+    rows = min(CHUNK_ROWS, world.rows - row)
+    for column in range(0, world.columns, CHUNK_COLUMNS):
+        columns = min(CHUNK_COLUMNS, world.columns - column)
+        terrain, flags = generator.generate(row, column, CHUNK_ROWS,
+                                            CHUNK_COLUMNS)
+        # Regions at the edges are generated whole, then cut to fit.
+        if rows < CHUNK_ROWS or columns < CHUNK_COLUMNS:
+            region = World(CHUNK_ROWS, CHUNK_COLUMNS)
+            region.terrain = terrain
+            region.flags = flags
+            terrain, flags = region.read_region(0, 0, rows, columns)
+        world.write_region(row, column, rows, columns, terrain, flags)
+
+
+def start_worker(generator):
+    global worker_generator
+    worker_generator = generator
+
+
+def run_band(path, chunk_row):
+    world = MappedWorld(path, writable=True)
+    try:
+        generate_band(worker_generator, world, chunk_row)
+    finally:
+        world.close()
+
+
+def generate_file(generator, path, rows, columns, processes=None):
+    """
+    Generate a rows * columns world into a world file at path, using a
+    pool of this many processes. processes=1 generates everything in
+    this process, which gives the same file.
+    """
+    with MapWriter(path, rows, columns, generator.seed):
+        pass
+
+    bands = range(-(-rows // CHUNK_ROWS))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(bands))
+    if processes <= 1:
+        start_worker(generator)
+        for chunk_row in bands:
+            run_band(path, chunk_row)
+        return
+
+    with ProcessPoolExecutor(processes, initializer=start_worker,
+                             initargs=(generator,)) as pool:
+        # Consume the results, so that errors in workers are raised here.
+        for result in pool.map(run_band, [path] * len(bands), bands):
+            pass
+
+
+def generate_world(generator, rows, columns, processes=None):
+    """
+    Generate a whole rows * columns World in parallel.
+    """
+    fd, path = tempfile.mkstemp(suffix=".hexc")
+    os.close(fd)
+    try:
+        generate_file(generator, path, rows, columns, processes)
+        mapped = MappedWorld(path)
+        world = World(rows, columns)
+        world.terrain[:] = mapped.terrain
+        world.flags[:] = mapped.flags
+        mapped.close()
+    finally:
+        os.remove(path)
+
+    return world
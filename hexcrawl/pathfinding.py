@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+"""
+Route finding over the hexes of a World.
+
+Entering a hex costs movement points depending on its terrain, and
+water can't be entered at all. All per-hex bookkeeping lives in flat
+arrays that are allocated once per Pathfinder and reused: instead of
+clearing them between searches, every search gets a new number and a
+hex only counts as seen or closed if it is stamped with that number.
+
+Move costs and distances are small integers, so open hexes are kept in a
+list of buckets, one per estimated cost, rather than in a heap.
+"""
+
+from array import array
+
+from .coords import NEIGHBOUR_OFFSETS, NeighbourTable
+from .world import TERRAINS
+
+# Movement points needed to enter a hex. None means it can't be entered.
+MOVE_COSTS = {
+    ".": 1,
+    "g": 1,
+    "F": 2,
+    "~": None,
+}
+
+
+class Pathfinder:
+
+    def __init__(self, world, move_costs=MOVE_COSTS):
+        self.world = world
+        self.rows = world.rows
+        self.columns = world.columns
+        self.neighbours = NeighbourTable(world.rows, world.columns)
+        # (index delta, row change, column change) for each neighbour,
+        # for even and odd columns, so the search loops can step to
+        # neighbours without building a list of them every time.
+        self.steps = tuple(
+            tuple((delta, row_mod, column_mod) for delta, (row_mod, column_mod)
+                  in zip(deltas, offsets))
+            for deltas, offsets in zip(self.neighbours.deltas,
+                                       NEIGHBOUR_OFFSETS))
+        # Indexed by terrain code, 0 for impassable, and padded out so
+        # that it can translate a whole terrain array at once.
+        self.costs = bytes(move_costs.get(terrain) or 0
+                           for terrain in TERRAINS).ljust(256, b"\0")
+        self.min_cost = min(cost for cost in self.costs if cost)
+        self.max_cost = max(self.costs)
+
+        size = world.rows * world.columns
+        self.cost = array("l", [0]) * size
+        self.came_from = array("l", [-1]) * size
+        self.seen = array("L", [0]) * size
+        self.closed = array("L", [0]) * size
+        self.search = 0
+
+    def start_search(self):
+        self.search += 1
+        if self.search >= 2 ** 32:
+            self.seen = array("L", [0]) * len(self.seen)
+            self.closed = array("L", [0]) * len(self.closed)
+            self.search = 1
+
+        return self.search
+
+    def get_move_costs(self):
+        """
+        Return the cost of entering every hex, indexed like the terrain,
+        looked up once for the whole world rather than once per step.
+        """
+        terrain = self.world.terrain
+        if isinstance(terrain, memoryview):
+            terrain = terrain.tobytes()
+
+        return terrain.translate(self.costs)
+
+    def find_path(self, start, goal):
+        """
+        Return the cheapest route from start to goal, both (row, column),
+        as a list of (row, column) including both ends. Returns None if
+        there is no route.
+        """
+        start = self.world.index(*start)
+        goal = self.world.index(*goal)
+        search = self.start_search()
+        cost = self.cost
+        came_from = self.came_from
+        seen = self.seen
+        closed = self.closed
+        move_costs = self.get_move_costs()
+        steps = self.steps
+        rows = self.rows
+        columns = self.columns
+        # Distances are worked out in cube coordinates, where x is the
+        # column and z is row - column // 2, and y follows from them.
+        goal_row, goal_column = divmod(goal, columns)
+        goal_z = goal_row - (goal_column >> 1)
+        min_cost = self.min_cost
+        # Bucket n holds the hexes whose cost so far plus estimated cost
+        # to the goal is n more than the start's estimate. A step never
+        # lowers the estimate, so buckets are emptied in order, and
+        # raises it by at most reach, so enough buckets are kept ahead.
+        # Within a bucket the hex found last comes first, which tends to
+        # be the one closest to the goal.
+        reach = self.max_cost + min_cost
+        start_row, start_column = divmod(start, columns)
+        dx = start_column - goal_column
+        dz = start_row - (start_column >> 1) - goal_z
+        first = (abs(dx) + abs(dz) + abs(dx + dz)) >> 1
+        buckets = [[start]] + [[] for _ in range(reach)]
+        pending = 1
+
+        cost[start] = 0
+        came_from[start] = -1
+        seen[start] = search
+        for bucket in buckets:
+            if not pending:
+                break
+            buckets.append([])
+            while bucket:
+                index = bucket.pop()
+                pending -= 1
+                if closed[index] == search:
+                    continue
+                if index == goal:
+                    return self.get_route(goal)
+                closed[index] = search
+
+                current_cost = cost[index]
+                row, column = divmod(index, columns)
+                inside = 0 < row < rows - 1 and 0 < column < columns - 1
+                for delta, row_mod, column_mod in steps[column & 1]:
+                    new_row = row + row_mod
+                    new_column = column + column_mod
+                    if not inside and not (0 <= new_row < rows and
+                                           0 <= new_column < columns):
+                        continue
+                    neighbour = index + delta
+                    if closed[neighbour] == search:
+                        continue
+                    move_cost = move_costs[neighbour]
+                    if not move_cost:
+                        continue
+                    new_cost = current_cost + move_cost
+                    if seen[neighbour] == search and \
+                       new_cost >= cost[neighbour]:
+                        continue
+                    seen[neighbour] = search
+                    cost[neighbour] = new_cost
+                    came_from[neighbour] = index
+
+                    dx = new_column - goal_column
+                    dz = new_row - (new_column >> 1) - goal_z
+                    distance = (abs(dx) + abs(dz) + abs(dx + dz)) >> 1
+                    buckets[new_cost + (distance - first) * min_cost].append(
+                        neighbour)
+                    pending += 1
+
+        return None
+
+    def get_route(self, goal):
+        route = []
+        index = goal
+        while index != -1:
+            route.append(divmod(index, self.columns))
+            index = self.came_from[index]
+        route.reverse()
+
+        return route
+
+    def get_reachable(self, start, points):
+        """
+        Return every hex that can be reached from start, a (row, column),
+        with at most this many movement points, as a dict mapping
+        (row, column) to the cheapest cost of getting there.
+        """
+        start = self.world.index(*start)
+        search = self.start_search()
+        cost = self.cost
+        seen = self.seen
+        closed = self.closed
+        move_costs = self.get_move_costs()
+        steps = self.steps
+        rows = self.rows
+        columns = self.columns
+
+        reachable = {}
+        cost[start] = 0
+        seen[start] = search
+        # One bucket for each cost from 0 to points.
+        buckets = [[] for _ in range(points + 1)]
+        buckets[0].append(start)
+        for current_cost, bucket in enumerate(buckets):
+            for index in bucket:
+                if closed[index] == search:
+                    continue
+                closed[index] = search
+                row, column = divmod(index, columns)
+                reachable[row, column] = current_cost
+
+                inside = 0 < row < rows - 1 and 0 < column < columns - 1
+                for delta, row_mod, column_mod in steps[column & 1]:
+                    if not inside and not (
+                            0 <= row + row_mod < rows and
+                            0 <= column + column_mod < columns):
+                        continue
+                    neighbour = index + delta
+                    if closed[neighbour] == search:
+                        continue
+                    move_cost = move_costs[neighbour]
+                    if not move_cost:
+                        continue
+                    new_cost = current_cost + move_cost
+                    if new_cost > points or (seen[neighbour] == search and
+                                             new_cost >= cost[neighbour]):
+                        continue
+                    seen[neighbour] = search
+                    cost[neighbour] = new_cost
+                    buckets[new_cost].append(neighbour)
+
+        return reachable
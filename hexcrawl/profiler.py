@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+"""
+Frame profiling.
+
+While profiling is on, every pass through the main loop is recorded as
+a frame: the time spent painting the map, drawing the info window,
+sending the frame to the terminal, handling keys and scrolling, how
+many addstr calls the map took, how many hexes were painted, unexplored
+placeholders included, and, for frames that follow a key press, the
+latency from reading the key to painting its result.
+
+The TUI only creates a FrameProfiler when profiling is turned on, and
+addstr calls are counted by wrapping the renderer's pads, so when it is
+off nothing is measured and nothing is wrapped. Hexes are taken from
+the running count the renderer keeps anyway.
+"""
+
+import csv
+import json
+import time
+from collections import deque
+
+# Frames kept for the trace, at most.
+MAX_FRAMES = 10000
+# Frames the overlay averages over.
+SUMMARY_FRAMES = 60
+PHASES = ("paint", "info", "output", "input", "scroll")
+FIELDS = ("frame", "time") + tuple(f"{phase}_ms" for phase in PHASES) + \
+    ("work_ms", "keys", "addstr", "hexes", "latency_ms")
+
+
+class CountingWindow:
+    """
+    Passes everything on to a curses window or pad, counting addstr
+    calls.
+    """
+
+    def __init__(self, win, profiler):
+        self.win = win
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.win, name)
+
+    def addstr(self, *args):
+        self.profiler.current["addstr"] += 1
+        return self.win.addstr(*args)
+
+    def overwrite(self, dest, *args):
+        # curses only accepts real windows.
+        return self.win.overwrite(getattr(dest, "win", dest), *args)
+
+
+class FrameProfiler:
+
+    def __init__(self, clock=time.perf_counter, max_frames=MAX_FRAMES):
+        self.clock = clock
+        self.frames = deque(maxlen=max_frames)
+        self.count = 0
+        self.start = clock()
+        self.last = self.start
+        # When the keys not yet painted were read, if there are any.
+        self.input_time = None
+        self.current = self.new_frame(self.start)
+        # The renderer whose hexes are counted, and its count when the
+        # current frame began.
+        self.renderer = None
+        self.painted = 0
+
+    def new_frame(self, now):
+        frame = dict.fromkeys(FIELDS, 0)
+        frame["frame"] = self.count
+        frame["time"] = round(now - self.start, 6)
+        frame["latency_ms"] = None
+        self.count += 1
+
+        return frame
+
+    def attach(self, renderer):
+        """
+        Start counting the renderer's addstr calls and painted hexes.
+        """
+        self.renderer = renderer
+        self.painted = renderer.painted
+        renderer.pad = CountingWindow(renderer.pad, self)
+        renderer.back_pad = CountingWindow(renderer.back_pad, self)
+
+    def detach(self, renderer):
+        self.renderer = None
+        renderer.pad = renderer.pad.win
+        renderer.back_pad = renderer.back_pad.win
+
+    def begin_frame(self):
+        """
+        Finish the current frame and start the next one.
+        """
+        now = self.clock()
+        frame = self.current
+        if self.renderer:
+            frame["hexes"] = self.renderer.painted - self.painted
+            self.painted = self.renderer.painted
+        frame["work_ms"] = sum(frame[f"{phase}_ms"] for phase in PHASES)
+        for field in FIELDS:
+            if field.endswith("_ms") and frame[field] is not None:
+                frame[field] = round(frame[field], 3)
+        self.frames.append(frame)
+        self.current = self.new_frame(now)
+        self.last = now
+
+    def mark(self, phase):
+        """
+        Charge the time since the last mark to a phase of this frame.
+        """
+        now = self.clock()
+        self.current[f"{phase}_ms"] += (now - self.last) * 1000
+        self.last = now
+        if phase == "paint" and self.input_time is not None:
+            self.current["latency_ms"] = (now - self.input_time) * 1000
+            self.input_time = None
+
+    def got_keys(self, keys):
+        """
+        Note that keys were read. Waiting for them isn't charged to any
+        phase.
+        """
+        now = self.clock()
+        self.last = now
+        self.current["keys"] += len(keys)
+        if keys and self.input_time is None:
+            self.input_time = now
+
+    def get_summary(self):
+        """
+        Return lines describing the recent frames, for the overlay.
+        """
+        frames = list(self.frames)[-SUMMARY_FRAMES:]
+        if not frames:
+            return ["No frames yet."]
+
+        def average(field):
+            values = [frame[field] for frame in frames
+                      if frame[field] is not None]
+            return sum(values) / len(values) if values else 0
+
+        last = frames[-1]
+        lines = [f"Last {len(frames)} of {self.count - 1} frames:",
+                 f"  last frame:   {last['work_ms']:8.2f} ms",
+                 f"  average:      {average('work_ms'):8.2f} ms",
+                 f"  slowest:      "
+                 f"{max(frame['work_ms'] for frame in frames):8.2f} ms"]
+        for phase in PHASES:
+            lines.append(f"  {phase + ':':<13} "
+                         f"{average(phase + '_ms'):8.2f} ms")
+        lines += [f"  addstr/frame: {average('addstr'):8.1f}",
+                  f"  hexes/frame:  {average('hexes'):8.1f}",
+                  f"  latency:      {average('latency_ms'):8.2f} ms"]
+
+        return lines
+
+    def draw(self, win):
+        rows, columns = win.getmaxyx()
+        lines = ["Frame profile, p to hide", ""] + self.get_summary()
+        win.erase()
+        for row, line in enumerate(lines[:rows]):
+            win.addstr(row, 0, line[:columns - 1])
+
+    def save(self, path):
+        """
+        Write the recorded frames to path, as CSV if it ends in .csv and
+        as JSON otherwise.
+        """
+        frames = list(self.frames)
+        with open(path, "w", newline="") as trace:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(trace, FIELDS)
+                writer.writeheader()
+                writer.writerows(frames)
+            else:
+                json.dump(frames, trace, indent=1)
@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+
+"""
+Viewport culled rendering of the map.
+
+The map is drawn in map coordinates: character rows and columns counted
+from the top left corner of hex 0,0. Only a window of it, slightly
+larger than the visible area, is kept in a curses pad. When the view
+scrolls outside that window the pad is moved, keeping what it already
+shows and drawing only the strips that have just come into view.
+
+What the pad shows, less the selection, is also kept as a canvas with
+one byte per cell, along with each line as text and runs of equal
+attributes. Writing the pad again, for a full redraw or a moved
+selection, is then one addstr call per run, without painting any hexes.
+Hexes are only painted where the pad moves to show more of the map, and
+where they change, such as when they are explored: every hex that
+touches the changed rectangle is painted again, clipped to it.
+
+Hexes that haven't been explored yet are drawn as a single placeholder
+character, without looking up anything about them.
+"""
+
+import curses
+from itertools import chain, compress, count
+from operator import ne
+
+from .coords import SCREEN_CENTER, get_screen_pos
+
+# Extra map kept around the visible area, so short scrolls are free.
+PAD_MARGIN_ROWS = 8
+PAD_MARGIN_COLUMNS = 16
+# Drawn in the middle of hexes that haven't been explored.
+PLACEHOLDER = "?"
+
+
+def intersect(rect, other):
+    """
+    Return the overlap of two (top, left, bottom, right) rectangles, or
+    None if they don't overlap. Bottom and right are exclusive.
+    """
+    top = max(rect[0], other[0])
+    left = max(rect[1], other[1])
+    bottom = min(rect[2], other[2])
+    right = min(rect[3], other[3])
+    if top >= bottom or left >= right:
+        return None
+
+    return top, left, bottom, right
+
+
+def subtract(rect, hole):
+    """
+    Return the parts of rect not covered by hole, as up to four
+    rectangles. Hole must lie within rect.
+    """
+    top, left, bottom, right = rect
+    hole_top, hole_left, hole_bottom, hole_right = hole
+    parts = [(top, left, hole_top, right),
+             (hole_bottom, left, bottom, right),
+             (hole_top, left, hole_bottom, hole_left),
+             (hole_top, hole_right, hole_bottom, right)]
+
+    return [part for part in parts if part[0] < part[2] and part[1] < part[3]]
+
+
+def union(rect, other):
+    """
+    Return the smallest rectangle covering two rectangles.
+    """
+    return (min(rect[0], other[0]), min(rect[1], other[1]),
+            max(rect[2], other[2]), max(rect[3], other[3]))
+
+
+def add_rect(rects, rect):
+    """
+    Add a rectangle to a list of them, merging it with those it
+    overlaps, so that no part of the map is in the list twice.
+    """
+    merged = True
+    while merged:
+        merged = False
+        for other in rects:
+            if intersect(rect, other):
+                rects.remove(other)
+                rect = union(rect, other)
+                merged = True
+                break
+    rects.append(rect)
+
+
+def get_hex_rect(hex):
+    """
+    Return the rectangle of the map a hex draws on, labels included.
+    """
+    top, left = hex.get_pos()
+    x_str_len = len(str(hex.column + 1))
+    y_str_len = len(str(hex.row + 1))
+
+    return (top, min(left - 1, left + 4 - x_str_len),
+            top + 5, max(left + 10, left + 5 + y_str_len))
+
+
+def get_hex_range(rect):
+    """
+    Return the ranges of hex rows and columns that may touch a rectangle
+    of the map. Generous, since labels can stick out of their hex.
+    """
+    top, left, bottom, right = rect
+
+    return (range(max(0, (top - 6) // 4), max(0, bottom // 4 + 1)),
+            range(max(0, (left - 14) // 8), max(0, right // 8 + 2)))
+
+
+class SpanRecorder:
+    """
+    Stands in for a curses window while a hex draws itself, and turns
+    what was drawn into spans: unbroken stretches of cells on one line,
+    stored as a byte string with one code per cell.
+    """
+
+    def __init__(self):
+        self.cells = {}
+
+    def addstr(self, row, column, text, attr=0):
+        for offset, char in enumerate(text):
+            self.cells[row, column + offset] = (char, attr)
+
+    def get_spans(self, codes):
+        """
+        Return what was drawn as a list of (row, column, end, cells),
+        where end is the column after the last cell. Each (character,
+        attribute) pair is numbered through the codes dict.
+        """
+        spans = []
+        for (row, column), cell in sorted(self.cells.items()):
+            code = codes.setdefault(cell, len(codes))
+            if spans:
+                last_row, last_column, cells = spans[-1]
+                if row == last_row and column == last_column + len(cells):
+                    cells.append(code)
+                    continue
+            spans.append((row, column, bytearray((code,))))
+
+        return [(row, column, column + len(cells), bytes(cells))
+                for row, column, cells in spans]
+
+
+class SpanCache:
+    """
+    Pre-rendered spans for hexes, relative to the hex position. Hex
+    bodies are keyed by everything that affects how they look, so there
+    are only a handful. Coordinate labels differ for every hex, and are
+    made up as they are painted.
+
+    Cells are one byte codes for a character and an attribute, so a
+    hex is painted with one slice assignment per line. There can be at
+    most 256 different codes, far more than the map uses.
+    """
+
+    def __init__(self, palette):
+        self.palette = palette
+        self.spans = {}
+        self.codes = {(" ", 0): 0}
+        # Where labels start, by the length of the column number in
+        # them, and the codes of the characters in them.
+        self.labels = {}
+        self.label_codes = None
+        # Built again whenever there are new codes.
+        self.tables = None
+
+    def get_tables(self):
+        """
+        Return tables for bytes.translate that turn codes into
+        characters and into attribute ids, and a list mapping those ids
+        back to curses attributes.
+        """
+        if self.tables and self.tables[0] == len(self.codes):
+            return self.tables[1:]
+
+        chars = bytearray(256)
+        attr_ids = bytearray(256)
+        attrs = {}
+        for (char, attr), code in self.codes.items():
+            chars[code] = ord(char)
+            attr_ids[code] = attrs.setdefault(attr, len(attrs))
+        self.tables = (len(self.codes), bytes(chars), bytes(attr_ids),
+                       list(attrs))
+
+        return self.tables[1:]
+
+    def get(self, hex, border_color):
+        key = (hex.looks, border_color)
+        spans = self.spans.get(key)
+        if spans is None:
+            recorder = SpanRecorder()
+            hex.draw_body(recorder, 0, 0, self.palette, border_color)
+            spans = self.spans[key] = recorder.get_spans(self.codes)
+
+        return spans
+
+    def get_label(self, hex):
+        """
+        Return where the coordinate label of a hex starts, relative to
+        the hex position, and its cells.
+        """
+        x_str = str(hex.column + 1)
+        start = self.labels.get(len(x_str))
+        if start is None:
+            # The first hex with a column number this long shows where
+            # labels like it go, and how labels are coloured.
+            recorder = SpanRecorder()
+            hex.draw_label(recorder, 0, 0, self.palette)
+            start = self.labels[len(x_str)] = min(recorder.cells)
+            if self.label_codes is None:
+                self.label_codes = self.get_label_codes(recorder.cells)
+        chars = f"{x_str},{hex.row + 1}".encode("ascii")
+
+        return start[0], start[1], chars.translate(self.label_codes)
+
+    def get_label_codes(self, cells):
+        """
+        Return a bytes.translate table turning label characters into
+        codes, given a recorded label. All digits look alike.
+        """
+        attrs = dict(cells.values())
+        digit_attr = next(attr for char, attr in attrs.items()
+                          if char.isdigit())
+        table = bytearray(256)
+        for char in "0123456789":
+            attrs[char] = digit_attr
+        for char, attr in attrs.items():
+            table[ord(char)] = self.codes.setdefault((char, attr),
+                                                     len(self.codes))
+
+        return bytes(table)
+
+    def get_placeholder(self):
+        spans = self.spans.get(PLACEHOLDER)
+        if spans is None:
+            recorder = SpanRecorder()
+            recorder.addstr(*SCREEN_CENTER, PLACEHOLDER, self.palette.blue)
+            spans = self.spans[PLACEHOLDER] = recorder.get_spans(self.codes)
+
+        return spans
+
+
+class Canvas:
+    """
+    An off-screen rectangle of the map, with one code per cell. Spans
+    are painted onto it in drawing order. To be written out, each line
+    is turned into text and runs of equal attributes, which are kept
+    until the line is painted over again.
+    """
+
+    def __init__(self, rect):
+        self.rect = rect
+        self.top, self.left, self.bottom, self.right = rect
+        self.width = self.right - self.left
+        self.cells = [bytearray(self.width)
+                      for row in range(self.top, self.bottom)]
+        # Each line as (text, [(start, end, attr), ...]), or None.
+        self.lines = [None] * len(self.cells)
+
+    def paint(self, row, column, spans):
+        row -= self.top
+        column -= self.left
+        lines = self.cells
+        height = len(lines)
+        width = self.width
+        for span_row, span_column, span_end, cells in spans:
+            y = row + span_row
+            x = column + span_column
+            end = column + span_end
+            if not (0 <= y < height and 0 <= x and end <= width):
+                if y < 0 or y >= height or end <= 0 or x >= width:
+                    continue
+                cells = cells[max(0, -x):width - x]
+                x = max(0, x)
+                end = x + len(cells)
+            lines[y][x:end] = cells
+
+    def paint_cells(self, row, column, cells):
+        """
+        Paint a single stretch of cells, such as a label.
+        """
+        y = row - self.top
+        x = column - self.left
+        end = x + len(cells)
+        width = self.width
+        if not (0 <= y < len(self.cells) and 0 <= x and end <= width):
+            if y < 0 or y >= len(self.cells) or end <= 0 or x >= width:
+                return
+            cells = cells[max(0, -x):width - x]
+            x = max(0, x)
+            end = x + len(cells)
+        self.cells[y][x:end] = cells
+
+    def copy(self, other):
+        """
+        Copy the cells another canvas has in common with this one.
+        Lines copied whole keep their text and runs.
+        """
+        common = intersect(self.rect, other.rect)
+        if not common:
+            return
+        top, left, bottom, right = common
+        whole = left == self.left == other.left and \
+            right == self.right == other.right
+        x = left - self.left
+        end = right - self.left
+        other_x = left - other.left
+        other_end = right - other.left
+        for row in range(top, bottom):
+            y = row - self.top
+            other_y = row - other.top
+            self.cells[y][x:end] = other.cells[other_y][other_x:other_end]
+            self.lines[y] = other.lines[other_y] if whole else None
+
+    def get_line(self, y, tables):
+        """
+        Return line y as text and runs of equal attributes, given the
+        tables from SpanCache.get_tables.
+        """
+        char_table, attr_table, attr_values = tables
+        cells = self.cells[y]
+        attrs = cells.translate(attr_table)
+        runs = []
+        start = 0
+        # Where the attribute changes, found without a Python loop over
+        # every cell, and then the end of the line.
+        for end in chain(compress(count(1), map(ne, attrs, attrs[1:])),
+                         (self.width,)):
+            runs.append((start, end, attr_values[attrs[start]]))
+            start = end
+        line = self.lines[y] = (cells.translate(char_table).decode("ascii"),
+                                runs)
+
+        return line
+
+    def write(self, win, rect, origin_row, origin_column, tables):
+        """
+        Write a rectangle of the canvas onto a window, with one addstr
+        call per run of equal attributes.
+        """
+        top, left, bottom, right = rect
+        column = self.left - origin_column
+        x = left - self.left
+        end = right - self.left
+        lines = self.lines
+        addstr = win.addstr
+        for y in range(top - self.top, bottom - self.top):
+            text, runs = lines[y] or self.get_line(y, tables)
+            row = self.top + y - origin_row
+            if x == 0 and end == self.width:
+                for start, stop, attr in runs:
+                    addstr(row, column + start, text[start:stop], attr)
+                continue
+            for start, stop, attr in runs:
+                if stop <= x:
+                    continue
+                if start >= end:
+                    break
+                start = max(start, x)
+                stop = min(stop, end)
+                addstr(row, column + start, text[start:stop], attr)
+
+
+class Renderer:
+    """
+    Paints the map onto a pad. What the pad shows, less the selection,
+    is also kept in a Canvas, so that the pad can be written again
+    without painting any hexes. Hexes are only painted where the pad
+    has moved to show more of the map, or where they were changed.
+    """
+
+    def __init__(self, get_hex, palette, backend=curses):
+        self.get_hex = get_hex
+        self.backend = backend
+        self.selected = None
+        self.selected_color = 0
+        # Hexes drawn with a border colour of their own, such as along a
+        # route, as (row, column) mapped to the colour.
+        self.marked = {}
+        # The explored hexes, or None to draw every hex, and a function
+        # telling which hexes are on the map.
+        self.explored = None
+        self.in_bounds = None
+        self.pad = None
+        self.back_pad = None
+        self.pad_rows = 0
+        self.pad_columns = 0
+        self.origin_row = 0
+        self.origin_column = 0
+        # The part of the map currently drawn on the pad, or None, and
+        # the canvas holding it.
+        self.drawn = None
+        self.canvas = None
+        # Rectangles of the map that need writing to the pad again, and
+        # those that need painting again first.
+        self.dirty = []
+        self.changed = []
+        self.spans = SpanCache(palette)
+        # Hexes painted so far, placeholders included, for profiling.
+        self.painted = 0
+
+    def resize(self, display_rows, display_columns):
+        # One spare row, since curses won't write the bottom right corner.
+        self.pad_rows = display_rows + PAD_MARGIN_ROWS * 2 + 1
+        self.pad_columns = display_columns + PAD_MARGIN_COLUMNS * 2
+        if self.pad:
+            self.pad.resize(self.pad_rows, self.pad_columns)
+            self.back_pad.resize(self.pad_rows, self.pad_columns)
+        else:
+            self.pad = self.backend.newpad(self.pad_rows, self.pad_columns)
+            self.back_pad = self.backend.newpad(self.pad_rows,
+                                                self.pad_columns)
+        self.pad.keypad(True)
+        self.back_pad.keypad(True)
+        if self.drawn:
+            # Resizing keeps the pad's contents, as far as they still fit.
+            self.drawn = intersect(self.drawn,
+                                   (self.origin_row, self.origin_column,
+                                    self.origin_row + self.pad_rows - 1,
+                                    self.origin_column + self.pad_columns))
+            self.set_canvas()
+
+    def set_canvas(self):
+        """
+        Make the canvas cover what the pad shows, keeping what it has in
+        common with the old one and painting the rest.
+        """
+        old_canvas = self.canvas
+        if not self.drawn:
+            self.canvas = None
+            return
+        if old_canvas and old_canvas.rect == self.drawn:
+            return
+
+        self.canvas = Canvas(self.drawn)
+        kept = old_canvas and intersect(old_canvas.rect, self.drawn)
+        if not kept:
+            self.paint_region(self.drawn)
+            return
+        self.canvas.copy(old_canvas)
+        for strip in subtract(self.drawn, kept):
+            self.paint_region(strip)
+
+    def paint_region(self, rect):
+        """
+        Paint the hexes of one rectangle of the map onto the canvas, in
+        the same order as a full redraw and clipped to the rectangle, so
+        overlapping neighbours come out right.
+        """
+        canvas = Canvas(rect)
+        rows, columns = get_hex_range(rect)
+        explored = self.explored
+        placeholder = self.spans.get_placeholder()
+        get_hex = self.get_hex
+        paint_hex = self.paint_hex
+        marked = self.marked
+        on_top = []
+        painted = 0
+        for row in rows:
+            for column in columns:
+                if explored is not None and (row, column) not in explored:
+                    if self.in_bounds(row, column):
+                        canvas.paint(*get_screen_pos(row, column),
+                                     placeholder)
+                        painted += 1
+                    continue
+                hex = get_hex(row, column)
+                if hex:
+                    paint_hex(canvas, hex)
+                    painted += 1
+                    if marked and (row, column) in marked:
+                        on_top.append(hex)
+        # Marked hexes go on top of their neighbours, like the selection,
+        # so their borders show in full.
+        for hex in on_top:
+            paint_hex(canvas, hex, marked[hex.row, hex.column])
+        self.painted += painted + len(on_top)
+        self.canvas.copy(canvas)
+
+    def draw_region(self, rect, pad=None):
+        """
+        Write one rectangle of the map from the canvas to the pad, with
+        the selection on top.
+        """
+        if not self.drawn:
+            return
+        rect = intersect(rect, self.drawn)
+        if not rect:
+            return
+
+        tables = self.spans.get_tables()
+        win = pad or self.pad
+        self.canvas.write(win, rect, self.origin_row, self.origin_column,
+                          tables)
+        selected = self.selected and intersect(get_hex_rect(self.selected),
+                                               rect)
+        if selected:
+            canvas = Canvas(selected)
+            canvas.copy(self.canvas)
+            self.paint_hex(canvas, self.selected, self.selected_color)
+            self.painted += 1
+            # Painting it may have made new codes.
+            canvas.write(win, selected, self.origin_row, self.origin_column,
+                         self.spans.get_tables())
+
+    def paint_hex(self, canvas, hex, border_color=0):
+        row, column = hex.get_pos()
+        spans = self.spans
+        canvas.paint(row, column, spans.get(hex, border_color))
+        # The label goes on top of the body, before the next hex.
+        label_row, label_column, cells = spans.get_label(hex)
+        canvas.paint_cells(row + label_row, column + label_column, cells)
+
+    def mark_dirty(self, rect):
+        """
+        Queue a rectangle of the map for writing to the pad again.
+        Overlapping rectangles are merged, so nothing is written twice.
+        """
+        add_rect(self.dirty, rect)
+
+    def mark_hex(self, hex):
+        """
+        Queue a hex for writing to the pad again, such as when it was
+        selected. What the hex itself looks like hasn't changed.
+        """
+        self.mark_dirty(get_hex_rect(hex))
+
+    def invalidate(self, rect):
+        """
+        Queue a rectangle of the map for painting again, since the hexes
+        in it have changed, and then writing to the pad.
+        """
+        add_rect(self.changed, rect)
+        self.mark_dirty(rect)
+
+    def invalidate_hex(self, hex):
+        self.invalidate(get_hex_rect(hex))
+
+    def set_marked(self, marked):
+        """
+        Replace the marked hexes with marked, a dict of (row, column) to
+        border colour, and paint the hexes that changed again.
+        """
+        old_marked = self.marked
+        self.marked = marked
+        if not self.drawn:
+            return
+        for row, column in old_marked.keys() | marked.keys():
+            hex = self.get_hex(row, column)
+            if hex:
+                rect = get_hex_rect(hex)
+                if intersect(rect, self.drawn):
+                    self.invalidate(rect)
+
+    def flush(self):
+        """
+        Paint the changed rectangles and write the dirty ones to the pad.
+        """
+        self.paint_changed()
+        dirty = self.dirty
+        self.dirty = []
+        for rect in dirty:
+            self.draw_region(rect)
+
+    def paint_changed(self):
+        changed = self.changed
+        self.changed = []
+        for rect in changed:
+            rect = self.drawn and intersect(rect, self.drawn)
+            if rect:
+                self.paint_region(rect)
+
+    def move_pad(self, row_pos, column_pos):
+        """
+        Center the pad's part of the map on the view with its top left
+        corner at row_pos, column_pos.
+        """
+        self.origin_row = max(0, row_pos - PAD_MARGIN_ROWS)
+        self.origin_column = max(0, column_pos - PAD_MARGIN_COLUMNS)
+        self.drawn = (self.origin_row, self.origin_column,
+                      self.origin_row + self.pad_rows - 1,
+                      self.origin_column + self.pad_columns)
+        self.set_canvas()
+
+    def draw(self, row_pos, column_pos):
+        """
+        Redraw the whole pad around the given top left corner of the view.
+        Only hexes the canvas doesn't already hold are painted.
+        """
+        self.move_pad(row_pos, column_pos)
+        self.paint_changed()
+        self.dirty = []
+        self.draw_region(self.drawn)
+
+    def forget(self):
+        """
+        Throw the canvas away, so that the next draw paints every hex,
+        such as after hexes changed without being invalidated.
+        """
+        self.canvas = None
+
+    def show(self, row_pos, column_pos, display_rows, display_columns):
+        """
+        Make sure the pad holds the view with its top left corner at
+        row_pos, column_pos, moving the pad if needed.
+        """
+        view = (row_pos, column_pos,
+                row_pos + display_rows, column_pos + display_columns)
+        if self.drawn and intersect(view, self.drawn) == view:
+            return
+
+        old_drawn = self.drawn
+        old_row = self.origin_row
+        old_column = self.origin_column
+        self.move_pad(row_pos, column_pos)
+        kept = old_drawn and intersect(old_drawn, self.drawn)
+        if not kept:
+            self.draw_region(self.drawn)
+            return
+
+        # Move what is still in view over to the back pad, write the
+        # newly exposed strips around it, and swap the pads.
+        top, left, bottom, right = kept
+        self.pad.overwrite(self.back_pad,
+                           top - old_row, left - old_column,
+                           top - self.origin_row, left - self.origin_column,
+                           bottom - 1 - self.origin_row,
+                           right - 1 - self.origin_column)
+        for strip in subtract(self.drawn, kept):
+            self.draw_region(strip, self.back_pad)
+        self.pad, self.back_pad = self.back_pad, self.pad
+
+    def noutrefresh(self, row_pos, column_pos, top, left, bottom, right):
+        """
+        Copy the view onto the screen. Nothing reaches the terminal until
+        the next doupdate, which sends the whole frame at once.
+        """
+        self.pad.noutrefresh(row_pos - self.origin_row,
+                             column_pos - self.origin_column,
+                             top, left, bottom, right)
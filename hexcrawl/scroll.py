@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""
+Scrolling the map view.
+
+The position the view has to scroll to, to keep a hex between the
+scroll thresholds, is worked out directly instead of one step at a time.
+In smooth mode the view then slides there at a fixed speed. The position
+is taken from the clock, so a frame that comes late simply jumps ahead,
+and nothing ever waits for the animation to finish.
+"""
+
+import time
+
+# Characters per second in smooth mode.
+SCROLL_SPEED = 50
+# Seconds between animation frames while scrolling smoothly.
+FRAME_TIME = 0.02
+
+
+def get_scroll_target(center, pos, display, min_threshold, max_threshold,
+                      limit=None):
+    """
+    Return the view position along one axis that brings center (a map
+    coordinate) within min_threshold and max_threshold percent of a
+    display this many characters long, moving as little as possible.
+    The result never goes below 0 or above limit, if one is given.
+    """
+    # Relative position is (center - pos) * 100 // display, which is
+    # below min_threshold exactly when pos > center - min * display / 100.
+    highest = max(center - -(-min_threshold * display // 100), 0)
+    if pos > highest:
+        pos = highest
+
+    # And above max_threshold when pos <= center - (max + 1) * display / 100.
+    lowest = center + -(max_threshold + 1) * display // 100 + 1
+    if limit is not None:
+        lowest = min(lowest, limit)
+    if pos < lowest:
+        pos = lowest
+
+    return pos
+
+
+class Scroller:
+
+    def __init__(self, smooth=False, speed=SCROLL_SPEED, clock=time.monotonic):
+        self.smooth = smooth
+        self.speed = speed
+        self.clock = clock
+        self.start = None
+        self.target = None
+        self.start_time = 0
+
+    def is_scrolling(self):
+        return self.target is not None
+
+    def scroll(self, pos, target):
+        """
+        Start scrolling from pos to target, both (row, column) tuples.
+        Returns the position to show right now.
+        """
+        if not self.smooth or pos == target:
+            self.stop()
+            return target
+
+        self.start = pos
+        self.target = target
+        self.start_time = self.clock()
+        return pos
+
+    def stop(self):
+        self.start = None
+        self.target = None
+
+    def get_pos(self):
+        """
+        Return where the view should be at this moment, while scrolling.
+        """
+        distance = int((self.clock() - self.start_time) * self.speed)
+        pos = tuple(self.step(start, target, distance)
+                    for start, target in zip(self.start, self.target))
+        if pos == self.target:
+            self.stop()
+
+        return pos
+
+    def step(self, start, target, distance):
+        if start < target:
+            return min(start + distance, target)
+
+        return max(start - distance, target)
@@ -0,0 +1,1285 @@
+#!/usr/bin/env python3
+
+import asyncio
+import curses
+import os
+import random
+import signal
+import sys
+import time
+from functools import partial
+
+from .compositor import AnsiBackend
+from .coords import (from_screen, get_adjacent, get_neighbours,
+                     get_screen_center, get_screen_pos)
+from .explore import Exploration
+from .features import FeatureIndex
+from .fov import FieldOfView
+from .generator import NoiseGenerator
+from .jobs import Jobs
+from .mapfile import replace_file, save_world
+from .messages import MessageLog
+from .overview import MAX_LEVEL, Overview
+from .palette import Palette
+from .parallel import generate_file
+from .pathfinding import Pathfinder
+from .profiler import FrameProfiler
+from .render import Renderer, get_hex_range
+from .scroll import FRAME_TIME, Scroller, get_scroll_target
+from .world import CHUNK_COLUMNS, CHUNK_ROWS, TOWN, ChunkedWorld, World
+
+INFO_COLUMNS = 40
+LEGEND_ROWS = 8
+LEGEND_COLUMNS = INFO_COLUMNS
+MIN_SCREEN_ROWS = 18
+MIN_SCREEN_COLUMNS = 67
+SCROLL_MIN_THRESHOLD = 25
+SCROLL_MAX_THRESHOLD = 75
+# Keys handled before the screen is redrawn, at most.
+MAX_KEYS_PER_FRAME = 256
+# Seconds without resize events before the screen is laid out again, so
+# dragging a terminal's edge doesn't lay it out at every step.
+RESIZE_DELAY = 0.1
+# Seconds between simulation ticks.
+TICK_TIME = 0.25
+# Chunks being generated ahead of the view at once, at most.
+MAX_PREFETCH = 4
+# Hexes around the two ends that a route may wander through.
+ROUTE_MARGIN = 16
+# Where the w key saves the world.
+SAVE_PATH = "hexcrawl-{seed}.map"
+# The zoom level the z key switches to at first.
+OVERVIEW_LEVEL = 2
+# How the arrow keys pan the overview, in rows and columns of cells.
+OVERVIEW_STEPS = {
+    curses.KEY_LEFT: (0, -2),
+    curses.KEY_RIGHT: (0, 2),
+    curses.KEY_DOWN: (1, 0),
+    curses.KEY_UP: (-1, 0),
+}
+# Lines the info log scrolls by with Page Up and Page Down.
+INFO_SCROLL_LINES = 10
+# How many towns the t key lists, and how far away it looks for them.
+NEAREST_TOWNS = 3
+TOWN_SEARCH_DISTANCE = 100
+
+DIRECTION_KEYS = {
+    ord('8'): "up",
+    ord('9'): "up_right",
+    ord('6'): "right",
+    ord('3'): "down_right",
+    ord('2'): "down",
+    ord('1'): "down_left",
+    ord('4'): "left",
+    ord('7'): "up_left",
+}
+
+
+#class UIPart
+
+
+class Hex:
+    """
+    A lightweight view of one hex in a World. All the actual data lives
+    in the world's arrays; a Hex only remembers where to look.
+    """
+
+    __slots__ = ("world", "row", "column")
+
+    rows = 5
+    columns = rows * 2 - 1
+
+    def __init__(self, world, row, column):
+        self.world = world
+        self.row = row
+        self.column = column
+
+    def __eq__(self, other):
+        return isinstance(other, Hex) and self.world is other.world and \
+            self.row == other.row and self.column == other.column
+
+    def __hash__(self):
+        return hash((self.row, self.column))
+
+    @property
+    def name(self):
+        return f"{self.column},{self.row}"
+
+    @property
+    def terrain(self):
+        return self.world.get_terrain(self.row, self.column)
+
+    @property
+    def town(self):
+        return self.world.is_town(self.row, self.column)
+
+    @property
+    def looks(self):
+        """
+        The terrain and whether the hex is a town, which is all that
+        draw_body looks at.
+        """
+        terrain, flags = self.world.get_cell(self.row, self.column)
+        return terrain, bool(flags & TOWN)
+
+    def get_color(self, palette):
+        terrain = self.terrain
+        if terrain == "F":
+            return palette.green
+        elif terrain == "g":
+            return palette.yellow
+        elif terrain == "~":
+            return palette.blue
+        return palette.white
+
+    def get_pos(self):
+        return get_screen_pos(self.row, self.column)
+
+    def get_center_pos(self):
+        return get_screen_center(self.row, self.column)
+
+    def draw(self, scr, palette, row=None, column=None, border_color=0):
+        if row is None:
+            row = self.row
+
+        if column is None:
+            column = self.column
+
+        row, column = get_screen_pos(row, column)
+
+        self.draw_body(scr, row, column, palette, border_color)
+        self.draw_label(scr, row, column, palette)
+
+    def draw_body(self, scr, row, column, palette, border_color=0):
+        """
+        Draw the outline and terrain of the hex, with its top left
+        character at row, column.
+        """
+        if border_color == 0:
+            border_color = palette.white
+        color = self.get_color(palette)
+
+        # First (top) row
+        scr.addstr(row, column + 1, "+-----+", border_color)
+        # Second row
+        scr.addstr(row + 1, column, "/", border_color)
+        scr.addstr(row + 1, column + 1, self.terrain * 7, color)
+        scr.addstr(row + 1, column + 8, "\\", border_color)
+        # Third (middle) row
+        scr.addstr(row + 2, column - 1, "+", border_color)
+        scr.addstr(row + 2, column, self.terrain * 9, color)
+        scr.addstr(row + 2, column + 9, "+", border_color)
+        if self.town:
+            scr.addstr(row + 2, column + 4, "#", palette.white)
+        # Fourth row
+        scr.addstr(row + 3, column, "\\", border_color)
+        scr.addstr(row + 3, column + 1, self.terrain * 7, color)
+
+        scr.addstr(row + 3, column + 8, "/", border_color)
+        # Fifth row
+        scr.addstr(row + 4, column + 1, "+-----+", border_color)
+
+        # if self.terrain == "F":
+        #     self.draw_forest(scr, row, column)
+        # if self.terrain == "g":
+        #     self.draw_grasslands(scr, row, column)
+
+    def draw_label(self, scr, row, column, palette):
+        """
+        Draw the coordinates of the hex across its top border.
+        """
+        middle = (self.columns - 1) // 2
+        scr.addstr(row, column + middle, ",", palette.white)
+        x_str = str(self.column + 1)
+        x_str_len = len(x_str)
+        scr.addstr(row, column + middle - x_str_len, x_str, palette.cyan)
+        scr.addstr(row, column + middle + 1, str(self.row + 1), palette.cyan)
+
+    def draw_forest(self, scr, row, column, palette):
+        for row_offset in range(1, 3):
+            for column_offset in range(1, 7):
+                if random.randint(1, 3) == 1:
+                    scr.addstr(row + row_offset, column + column_offset,
+                               "O", palette.green)
+                    scr.addstr(row + row_offset + 1, column + column_offset,
+                               "|", palette.yellow)
+
+    def draw_grasslands(self, scr, row, column, palette):
+        for row_offset in range(1, 4):
+            for column_offset in range(1, 7):
+                val = random.randint(1, 6)
+                if val == 1:
+                    scr.addstr(row + row_offset, column + column_offset,
+                               ".", palette.yellow)
+                elif val == 2:
+                    scr.addstr(row + row_offset, column + column_offset,
+                               "|", palette.green)
+                elif val == 3:
+                    scr.addstr(row + row_offset, column + column_offset,
+                               "/", palette.green)
+                elif val == 4:
+                    scr.addstr(row + row_offset, column + column_offset,
+                               ":", palette.green)
+                elif val == 5:
+                    scr.addstr(row + row_offset, column + column_offset,
+                               ",", palette.green)
+
+
+class TUI:
+
+    def __init__(self, scr, rows=20, columns=30, seed=None, world=None,
+                 backend=curses, palette=None, generator=None, fog=True,
+                 profile=False):
+        # A ready made world, such as a loaded one, sets the map size.
+        if world:
+            rows = world.rows
+            columns = world.columns
+            seed = getattr(world, "seed", seed)
+        self.world = world
+        self.scr = scr
+        # The curses module, or something that stands in for it.
+        self.backend = backend
+        self.palette = palette or Palette()
+        self.rows = rows
+        self.columns = columns
+        self.generator = generator or NoiseGenerator(seed)
+        self.renderer = Renderer(self.get_hex, self.palette, backend)
+        self.renderer.selected_color = self.palette.magenta
+        # What has been seen so far, or None to show the whole map.
+        self.exploration = Exploration() if fog else None
+        self.scroller = Scroller()
+        self.log = MessageLog()
+        self.info = None
+        self.legend = None
+        # When the latest of a burst of resize events came, if the screen
+        # hasn't been laid out again since.
+        self.resize_time = None
+        # Whether the terminal is too small to lay the screen out in.
+        self.too_small = False
+        # Frame timings are only recorded while there is a profiler.
+        self.profiler = None
+        self.show_profile = False
+        # Whether profiling goes on when the overlay is hidden.
+        self.keep_profiling = profile
+        # Background jobs, while the main loop runs.
+        self.jobs = None
+        self.wake = None
+        self.ticks = 0
+        # The view position at the last tick.
+        self.last_view = None
+        # The overview's zoom level, or None while showing hexes, and
+        # the cell in its top left corner.
+        self.zoom = None
+        self.overview_level = OVERVIEW_LEVEL
+        self.overview_top = 0
+        self.overview_left = 0
+        self.overview_win = None
+        # What the overview window shows, and whether parts of it are
+        # still to be filled in.
+        self.overview_drawn = None
+        self.overview_pending = False
+        # The selection the overview last scrolled to.
+        self.overview_followed = None
+        self.data = {}
+        self.data["selected_hex"] = None
+        # The hexes that can be seen from the selected hex.
+        self.data["visible"] = frozenset()
+        # The last route found from the selected hex, drawn on the map.
+        self.data["route"] = None
+        self.setup(rows, columns)
+        self.setup_hexes()
+        if profile:
+            self.start_profiling()
+        self.print("1234567890" * 4)
+        self.print("Welcome to Hexcrawl!")
+        self.print(f"Screen size is {self.screen_rows} lines by "
+                   f"{self.screen_columns} columns.")
+        self.print(f"Pad is {self.pad_display_columns} characters wide.")
+        self.info_dump()
+
+    def setup(self, rows=0, columns=0):
+        self.verify_screen_size()
+        if rows == 0:
+            rows = self.rows
+        if columns == 0:
+            columns = self.columns
+        self.scr.clear()
+        self.setup_screen_size()
+        self.setup_pad(rows, columns, self.screen_rows - 1,
+                       self.screen_columns - INFO_COLUMNS - 1)
+        self.setup_info(self.screen_rows - LEGEND_ROWS, INFO_COLUMNS)
+        self.setup_legend(LEGEND_ROWS, LEGEND_COLUMNS)
+        self.setup_dividers()
+        self.draw_legend()
+        # for i in range(50):
+        #     self.print(str(i))
+
+    def resize(self):
+        """
+        Lay the screen out again for a new terminal size. Windows and
+        pads are resized in place, the map keeps what it has drawn and
+        only paints what comes into view, and the selected hex stays at
+        the same relative place in the view.
+        """
+        self.resize_time = None
+        # Until the terminal grows again, the main loop's SIGWINCH
+        # handler brings it back here, and nothing else is drawn.
+        self.too_small = not self.check_screen_size()
+        if self.too_small:
+            return
+
+        old_display_rows = self.pad_display_rows
+        old_display_columns = self.pad_display_columns
+        self.screen_rows, self.screen_columns = self.scr.getmaxyx()
+        self.scr.erase()
+        self.setup_pad(self.rows, self.columns, self.screen_rows - 1,
+                       self.screen_columns - INFO_COLUMNS - 1)
+        self.setup_info(self.screen_rows - LEGEND_ROWS, INFO_COLUMNS)
+        self.setup_legend(LEGEND_ROWS, LEGEND_COLUMNS)
+        self.setup_dividers()
+        self.draw_legend()
+        if self.overview_win:
+            self.overview_win.resize(self.pad_display_rows,
+                                     self.pad_display_columns)
+            self.overview_drawn = None
+
+        selected = self.get_selected_hex()
+        if selected:
+            center_row, center_column = selected.get_center_pos()
+            self.row_pos = center_row - (center_row - self.row_pos) * \
+                self.pad_display_rows // old_display_rows
+            self.column_pos = center_column - \
+                (center_column - self.column_pos) * \
+                self.pad_display_columns // old_display_columns
+        self.scroller.stop()
+        self.normalize_pos()
+        if self.zoom is not None:
+            self.center_overview(*self.get_center_hex())
+        self.print("Screen has been resized.")
+
+    def draw_legend(self):
+        self.legend.erase()
+        #                   1234567890123456789012345678901234567890
+        self.legend.addstr("\n  Move selection        Scroll map\n")
+        self.legend.addstr("  ==============        ==========\n")
+        self.legend.addstr("     7  8  9            Use Arrow keys\n")
+        self.legend.addstr("      \\ | /             to scroll map.\n")
+        self.legend.addstr("    4 - 5 - 6\n")
+        self.legend.addstr("      / | \\\n")
+        self.legend.addstr("     1  2  3")
+        self.legend.noutrefresh()
+
+    def setup_screen_size(self):
+        self.screen_rows, self.screen_columns = self.scr.getmaxyx()
+        self.row_pos = 0
+        self.column_pos = 0
+
+    def setup_pad(self, rows, columns, display_rows, display_columns):
+        # The size of the whole map in characters, or None if it has no
+        # edge in that direction.
+        self.map_rows = rows * 4 + 3 if rows else None
+        self.map_columns = columns * 8 + 3 if columns else None
+        self.pad_display_rows = display_rows
+        self.pad_display_columns = display_columns
+        # The pad only holds the visible part of the map and a margin.
+        self.renderer.resize(display_rows, display_columns)
+        self.pad_rows = self.renderer.pad_rows
+        self.pad_columns = self.renderer.pad_columns
+
+    def setup_info(self, rows, columns):
+        self.info_rows = rows
+        self.info_columns = columns
+        if self.info:
+            self.info.resize(self.info_rows - 2, self.info_columns)
+            self.info.mvwin(1, self.screen_columns - self.info_columns)
+        else:
+            self.info = self.backend.newwin(self.info_rows - 2,
+                                            self.info_columns, 1,
+                                            self.screen_columns -
+                                            self.info_columns)
+        # The window is blank or has moved, so the log is drawn again.
+        self.log.changed = True
+
+    def setup_legend(self, rows, columns):
+        self.legend_rows = rows
+        self.legend_columns = columns
+        if self.legend:
+            self.legend.resize(rows, columns)
+            self.legend.mvwin(self.screen_rows - rows,
+                              self.screen_columns - self.info_columns)
+        else:
+            self.legend = self.backend.newwin(rows, columns,
+                                              self.screen_rows - rows,
+                                              self.screen_columns -
+                                              self.info_columns)
+
+    def setup_dividers(self):
+        palette = self.palette
+
+        # Vertical line
+        for row in range(self.screen_rows):
+            self.scr.addstr(row, self.pad_display_columns, "|",
+                            palette.magenta)
+
+        # Top of screen line
+        self.scr.addstr(0, 0, "-" * self.screen_columns, palette.magenta)
+
+        # Legend line
+        self.scr.addstr(self.info_rows - 1, self.pad_display_columns + 1,
+                        "-" * (self.screen_columns -
+                               self.pad_display_columns - 1),
+                        palette.magenta)
+
+        # World heading
+        title_column = self.pad_display_columns // 2 - 3
+        self.scr.addstr(0, title_column, "World", palette.green)
+        self.scr.addstr(0, title_column - 2, "[ ", palette.magenta)
+        self.scr.addstr(0, title_column + 5, " ]", palette.magenta)
+
+        # Info heading
+        title_column = self.screen_columns - self.info_columns // 2 - 2
+        self.scr.addstr(0, title_column, "Info", palette.green)
+        self.scr.addstr(0, title_column - 2, "[ ", palette.magenta)
+        self.scr.addstr(0, title_column + 4, " ]", palette.magenta)
+
+        # Legend heading
+        self.scr.addstr(self.info_rows - 1, self.pad_display_columns + 17,
+                        " Legend ", palette.green)
+        self.scr.addstr(self.info_rows - 1, self.pad_display_columns + 16,
+                        "[", palette.magenta)
+        self.scr.addstr(self.info_rows - 1, self.pad_display_columns + 25,
+                        "]", palette.magenta)
+
+        # Pluses at intersections
+        self.scr.addstr(0, self.pad_display_columns, "+", palette.magenta)
+        self.scr.addstr(self.info_rows - 1, self.pad_display_columns, "+",
+                        palette.magenta)
+        self.scr.noutrefresh()
+
+    def setup_hexes(self):
+        if not self.world:
+            self.world = ChunkedWorld(self.generator, self.rows,
+                                      self.columns)
+        self.towns = FeatureIndex(self.world)
+        self.fov = FieldOfView(self.world)
+        self.overview = Overview(self.world, self.palette)
+        self.world.add_listener(self.hex_changed)
+        self.world.add_listener(self.fov.invalidate)
+        self.world.add_listener(self.towns.update)
+        self.world.add_listener(self.overview.invalidate)
+        if self.exploration:
+            self.renderer.explored = self.exploration.explored
+            self.renderer.in_bounds = self.world.in_bounds
+
+    def hex_changed(self, row, column):
+        """
+        Paint a hex again after the world changed it, and the overview
+        with it.
+        """
+        self.overview_drawn = None
+        hex = self.get_hex(row, column)
+        if hex:
+            self.renderer.invalidate_hex(hex)
+
+    def get_hex(self, row, column):
+        if not self.world.in_bounds(row, column):
+            return None
+
+        return Hex(self.world, row, column)
+
+    def get_hex_pos(self, row, column):
+        """
+        Return the top left character position of the hex in row,column format.
+        """
+        return get_screen_pos(row, column)
+
+    def get_hex_center_pos(self, row, column):
+        """
+        Return the center character position of the hex in row,column format.
+        """
+        return get_screen_center(row, column)
+
+    def get_adjacent_hexes(self, row, column):
+        hexes = []
+
+        for new_row, new_column in get_neighbours(row, column):
+            hex = self.get_hex(new_row, new_column)
+            if hex:
+                hexes.append(hex)
+
+        return hexes
+
+    def get_adjacent_hex(self, row, column, direction):
+        try:
+            new_row, new_column = get_adjacent(row, column, direction)
+        except KeyError:
+            self.print(f"get_adjacent_hex: illegal direction: {direction}")
+            return self.get_hex(row, column)
+
+        return self.get_hex(new_row, new_column)
+
+    def draw(self):
+        self.renderer.draw(self.row_pos, self.column_pos)
+
+    def normalize_pos(self):
+        if self.column_pos < 0:
+            self.column_pos = 0
+        elif self.map_columns is not None and \
+                self.column_pos > self.map_columns - self.pad_display_columns:
+            self.column_pos = self.map_columns - self.pad_display_columns
+        if self.row_pos < 0:
+            self.row_pos = 0
+        elif self.map_rows is not None and \
+                self.row_pos > self.map_rows - self.pad_display_rows:
+            self.row_pos = self.map_rows - self.pad_display_rows
+
+    def scroll_to_selected_hex(self):
+        sel_hex = self.get_selected_hex()
+        if not sel_hex:
+            return
+
+        if self.zoom is not None:
+            # Only a moving selection is followed, so the overview can be
+            # panned away from it.
+            if self.overview_followed == (sel_hex.row, sel_hex.column):
+                return
+            self.overview_followed = (sel_hex.row, sel_hex.column)
+            cell_row = (sel_hex.row >> self.zoom) - self.overview_top
+            cell_column = (sel_hex.column >> self.zoom) - self.overview_left
+            if not (0 <= cell_row < self.pad_display_rows and
+                    0 <= cell_column < self.pad_display_columns):
+                self.center_overview(sel_hex.row, sel_hex.column)
+            return
+
+        center_row, center_column = sel_hex.get_center_pos()
+        row_limit = None
+        column_limit = None
+        if self.map_rows is not None:
+            row_limit = self.map_rows - self.pad_display_rows
+        if self.map_columns is not None:
+            column_limit = self.map_columns - self.pad_display_columns
+
+        target = (get_scroll_target(center_row, self.row_pos,
+                                    self.pad_display_rows,
+                                    SCROLL_MIN_THRESHOLD,
+                                    SCROLL_MAX_THRESHOLD, row_limit),
+                  get_scroll_target(center_column, self.column_pos,
+                                    self.pad_display_columns,
+                                    SCROLL_MIN_THRESHOLD,
+                                    SCROLL_MAX_THRESHOLD, column_limit))
+        self.row_pos, self.column_pos = \
+            self.scroller.scroll((self.row_pos, self.column_pos), target)
+
+    def update_scroll(self):
+        if self.scroller.is_scrolling():
+            self.row_pos, self.column_pos = self.scroller.get_pos()
+
+    def refresh_pad(self):
+        if self.zoom is not None:
+            self.refresh_overview()
+            return
+
+        self.renderer.flush()
+        self.renderer.show(self.row_pos, self.column_pos,
+                           self.pad_display_rows, self.pad_display_columns)
+        self.renderer.noutrefresh(self.row_pos, self.column_pos, 1, 0,
+                                  self.screen_rows - 1, self.screen_columns -
+                                  self.info_columns - 2)
+
+    def set_zoom(self, level):
+        """
+        Show the overview at a zoom level, or the hexes again if level is
+        None, centred on the selected hex.
+        """
+        row, column = self.get_center_hex()
+        self.scroller.stop()
+        if level is None:
+            self.zoom = None
+            self.goto_and_center_on(*get_screen_pos(row, column))
+            # The overview was drawn over what the pad shows.
+            self.renderer.pad.touchwin()
+            return
+
+        if not self.overview_win:
+            self.overview_win = self.backend.newwin(self.pad_display_rows,
+                                                    self.pad_display_columns,
+                                                    1, 0)
+        if self.zoom is None:
+            self.overview_win.touchwin()
+        self.zoom = self.overview_level = level
+        self.center_overview(row, column)
+        self.overview_followed = (row, column)
+        size = 1 << level
+        self.print(f"Overview, {size} by {size} hexes per character. "
+                   "z shows hexes, + and - zoom.")
+
+    def get_center_hex(self):
+        """
+        Return the selected hex, or else the one in the middle of the
+        view, as (row, column).
+        """
+        selected = self.get_selected_hex()
+        if selected:
+            return selected.row, selected.column
+        if self.zoom is not None:
+            return ((self.overview_top + self.pad_display_rows // 2) <<
+                    self.zoom,
+                    (self.overview_left + self.pad_display_columns // 2) <<
+                    self.zoom)
+
+        return from_screen(self.row_pos + self.pad_display_rows // 2,
+                           self.column_pos + self.pad_display_columns // 2)
+
+    def center_overview(self, row, column):
+        self.overview_top = (row >> self.zoom) - self.pad_display_rows // 2
+        self.overview_left = (column >> self.zoom) - \
+            self.pad_display_columns // 2
+        self.normalize_overview()
+
+    def normalize_overview(self):
+        # Cells are rounded up, so the last one may be partly off the map.
+        if self.rows is not None:
+            cells = -(-self.rows >> self.zoom)
+            self.overview_top = min(self.overview_top,
+                                    cells - self.pad_display_rows)
+        if self.columns is not None:
+            cells = -(-self.columns >> self.zoom)
+            self.overview_left = min(self.overview_left,
+                                     cells - self.pad_display_columns)
+        self.overview_top = max(self.overview_top, 0)
+        self.overview_left = max(self.overview_left, 0)
+
+    def refresh_overview(self):
+        selected = self.get_selected_hex()
+        if selected:
+            selected = (selected.row, selected.column)
+        view = (self.zoom, self.overview_top, self.overview_left, selected)
+        if view == self.overview_drawn and not self.overview_pending:
+            return
+
+        explored = self.exploration.explored if self.exploration else None
+        complete = self.overview.draw(self.overview_win, self.zoom,
+                                      self.overview_top, self.overview_left,
+                                      selected, explored)
+        self.overview_drawn = view
+        self.overview_pending = not complete
+        self.overview_win.noutrefresh()
+
+    def refresh_info(self):
+        if self.show_profile:
+            self.profiler.draw(self.info)
+            self.info.noutrefresh()
+            # Bring the log back when the overlay is hidden.
+            self.log.changed = True
+        elif self.log.changed:
+            self.log.draw(self.info)
+            self.info.noutrefresh()
+
+    def start_profiling(self):
+        self.profiler = FrameProfiler()
+        self.profiler.attach(self.renderer)
+
+    def stop_profiling(self):
+        self.profiler.detach(self.renderer)
+        self.profiler = None
+
+    def toggle_profile(self):
+        """
+        Show or hide the frame profile in the info window. Profiling
+        starts with the overlay, and stops with it unless it was asked
+        for from the start.
+        """
+        if self.show_profile:
+            self.show_profile = False
+            if not self.keep_profiling:
+                self.stop_profiling()
+        else:
+            if not self.profiler:
+                self.start_profiling()
+            self.show_profile = True
+
+    def main_loop(self):
+        return asyncio.run(self.run())
+
+    async def run(self):
+        """
+        The main loop. Between frames it waits for whatever comes first:
+        a key, a finished background job, the next frame of a smooth
+        scroll, or the end of a burst of resizes. Simulation ticks run
+        alongside it at a fixed rate.
+        """
+        loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        self.jobs = Jobs(on_error=self.job_failed)
+        # A terminal wakes the loop up when there is input. Other
+        # backends are polled every frame.
+        watching = self.backend is curses or self.backend.terminal
+        if watching:
+            loop.add_reader(sys.stdin.fileno(), self.wake.set)
+            loop.add_signal_handler(signal.SIGWINCH, self.terminal_resized)
+        ticks = asyncio.create_task(self.run_ticks())
+
+        try:
+            while True:
+                profiler = self.profiler
+                if self.resize_time is not None and \
+                        time.monotonic() - self.resize_time >= RESIZE_DELAY:
+                    self.resize()
+                # Nothing is drawn in the middle of a burst of resizes.
+                if self.resize_time is None and not self.too_small:
+                    if profiler:
+                        profiler.begin_frame()
+                    self.update_scroll()
+                    self.refresh_pad()
+                    if profiler:
+                        profiler.mark("paint")
+                    self.refresh_info()
+                    if profiler:
+                        profiler.mark("info")
+                    # Everything drawn this frame goes out in one update.
+                    self.backend.doupdate()
+                    if profiler:
+                        profiler.mark("output")
+
+                await self.wait(watching)
+                keys = self.read_keys(0)
+                if profiler:
+                    profiler.got_keys(keys)
+                if not keys:
+                    continue
+
+                if self.handle_keys(keys):
+                    return True
+                if profiler:
+                    profiler.mark("input")
+                self.normalize_pos()
+                self.scroll_to_selected_hex()
+                if profiler:
+                    profiler.mark("scroll")
+        finally:
+            ticks.cancel()
+            if watching:
+                loop.remove_reader(sys.stdin.fileno())
+                loop.remove_signal_handler(signal.SIGWINCH)
+            self.jobs.shutdown()
+            self.jobs = None
+
+    async def wait(self, watching):
+        if self.resize_time is not None:
+            timeout = RESIZE_DELAY
+        elif self.scroller.is_scrolling() or self.overview_pending or \
+                not watching:
+            timeout = FRAME_TIME
+        else:
+            timeout = None
+
+        try:
+            await asyncio.wait_for(self.wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.wake.clear()
+
+    def terminal_resized(self):
+        self.update_terminal_size()
+        self.resize_time = time.monotonic()
+        self.wake.set()
+
+    def update_terminal_size(self):
+        """
+        Tell curses, or the backend standing in for it, the terminal's
+        size. The main loop's SIGWINCH handler takes the place of the one
+        curses has, so curses doesn't notice by itself. Nothing is done if
+        the size hasn't changed, since resizing queues a KEY_RESIZE.
+        """
+        if self.backend is not curses and not self.backend.terminal:
+            return
+
+        size = os.get_terminal_size(sys.__stdout__.fileno())
+        if (size.lines, size.columns) == self.scr.getmaxyx():
+            return
+        if self.backend is curses:
+            curses.resizeterm(size.lines, size.columns)
+        else:
+            self.backend.resize(size.lines, size.columns)
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += TICK_TIME
+            await asyncio.sleep(max(next_tick - loop.time(), 0))
+            self.tick()
+
+    def tick(self):
+        """
+        Advance the world by one step. Nothing in it moves on its own
+        yet, so for now a tick only looks ahead of the view.
+        """
+        self.ticks += 1
+        self.prefetch_chunks()
+
+    def prefetch_chunks(self):
+        """
+        Generate the chunks one screen ahead of the way the view has
+        been scrolling since the last tick, in the background.
+        """
+        view = (self.row_pos, self.column_pos)
+        last_view = self.last_view
+        self.last_view = view
+        world = self.world
+        if not last_view or view == last_view or \
+                not hasattr(world, "add_chunk"):
+            return
+
+        row_step = (view[0] > last_view[0]) - (view[0] < last_view[0])
+        column_step = (view[1] > last_view[1]) - (view[1] < last_view[1])
+        top = self.row_pos + row_step * self.pad_display_rows
+        left = self.column_pos + column_step * self.pad_display_columns
+        rows, columns = get_hex_range((top, left,
+                                       top + self.pad_display_rows,
+                                       left + self.pad_display_columns))
+        if not rows or not columns:
+            return
+
+        for chunk_row in range(rows.start // CHUNK_ROWS,
+                               (rows.stop - 1) // CHUNK_ROWS + 1):
+            for chunk_column in range(columns.start // CHUNK_COLUMNS,
+                                      (columns.stop - 1) // CHUNK_COLUMNS +
+                                      1):
+                if len(self.jobs) >= MAX_PREFETCH:
+                    return
+                if world.has_chunk(chunk_row, chunk_column) or \
+                        not world.in_bounds(chunk_row * CHUNK_ROWS,
+                                            chunk_column * CHUNK_COLUMNS):
+                    continue
+                self.jobs.start(("chunk", chunk_row, chunk_column),
+                                world.generate_chunk,
+                                partial(world.add_chunk, chunk_row,
+                                        chunk_column),
+                                chunk_row, chunk_column)
+
+    def run_job(self, key, work, done, lane=None):
+        """
+        Run work in the background and pass its result to done. Returns
+        False if the same job is already running. Outside the main loop
+        the work is simply done straight away.
+        """
+        if self.jobs is None:
+            done(work())
+            return True
+
+        def finished(result):
+            done(result)
+            self.wake.set()
+
+        return self.jobs.start(key, work, finished, lane=lane)
+
+    def job_failed(self, key, error):
+        name = key if isinstance(key, str) else key[0]
+        self.print(f"Background {name} job failed: {error}")
+        self.wake.set()
+
+    def read_keys(self, delay=-1):
+        """
+        Wait up to delay milliseconds, or forever if it is negative, for
+        a key and return it, along with every key already queued up
+        behind it, so that they can all be handled before the next
+        redraw. Returns an empty list if no key came before the timeout.
+        """
+        pad = self.renderer.pad
+
+        pad.timeout(delay)
+        key = pad.getch()
+        if key == curses.ERR:
+            return []
+
+        keys = [key]
+        pad.timeout(0)
+        while len(keys) < MAX_KEYS_PER_FRAME:
+            key = pad.getch()
+            if key == curses.ERR:
+                break
+            keys.append(key)
+
+        return keys
+
+    def handle_keys(self, keys):
+        """
+        Handle a batch of keys. Selection moves are followed through the
+        world without drawing anything, and only the final selection is
+        drawn. Returns True if the user wants to quit.
+        """
+        selected = self.get_selected_hex()
+        off_map = False
+
+        for key in keys:
+            direction = DIRECTION_KEYS.get(key)
+            if direction:
+                if selected:
+                    new_selected = self.get_adjacent_hex(selected.row,
+                                                         selected.column,
+                                                         direction)
+                    if new_selected:
+                        selected = new_selected
+                    else:
+                        off_map = True
+                continue
+
+            # Other keys may depend on the selection, so catch up first.
+            if selected != self.get_selected_hex():
+                self.select_hex(selected.row, selected.column)
+
+            if self.zoom is not None and key in OVERVIEW_STEPS:
+                row_step, column_step = OVERVIEW_STEPS[key]
+                self.overview_top += row_step
+                self.overview_left += column_step
+                self.normalize_overview()
+            elif key == curses.KEY_LEFT:
+                self.column_pos -= 2
+            elif key == curses.KEY_RIGHT:
+                self.column_pos += 2
+            elif key == curses.KEY_DOWN:
+                self.row_pos += 1
+            elif key == curses.KEY_UP:
+                self.row_pos -= 1
+            elif key == ord('5'):
+                if selected and self.zoom is not None:
+                    self.center_overview(selected.row, selected.column)
+                elif selected:
+                    self.goto_and_center_on(*self.get_selected_hex_pos())
+            elif key == ord('q') or key == ord('Q'):
+                return True
+            elif key == curses.KEY_RESIZE:
+                # Laid out by the main loop once the resizing stops.
+                self.resize_time = time.monotonic()
+            elif key == ord("u"):
+                self.unselect_hex()
+                selected = None
+            elif key == ord("s"):
+                self.scroller.smooth = not self.scroller.smooth
+                self.print("Smooth scrolling is " +
+                           ("on." if self.scroller.smooth else "off."))
+            elif key == ord("t"):
+                self.print_nearest_towns()
+            elif key == ord("p"):
+                self.toggle_profile()
+            elif key == ord("z"):
+                self.set_zoom(None if self.zoom is not None
+                              else self.overview_level)
+            elif key == ord("-"):
+                if self.zoom is None:
+                    self.set_zoom(0)
+                elif self.zoom < MAX_LEVEL:
+                    self.set_zoom(self.zoom + 1)
+            elif key in (ord("+"), ord("=")):
+                if self.zoom is not None:
+                    self.set_zoom(self.zoom - 1 if self.zoom else None)
+            elif key == ord("r"):
+                self.find_route()
+            elif key == ord("w"):
+                self.save()
+            elif key == curses.KEY_PPAGE:
+                self.log.scroll_by(INFO_SCROLL_LINES)
+            elif key == curses.KEY_NPAGE:
+                self.log.scroll_by(-INFO_SCROLL_LINES)
+
+        if selected != self.get_selected_hex():
+            self.select_hex(selected.row, selected.column)
+        if off_map:
+            self.print("Trying to move off map.")
+
+        return False
+
+    def check_screen_size(self):
+        """
+        Return True if the screen is big enough. If it isn't, say so on
+        it instead.
+        """
+        rows, columns = self.scr.getmaxyx()
+        if rows >= MIN_SCREEN_ROWS and columns >= MIN_SCREEN_COLUMNS:
+            return True
+
+        self.scr.erase()
+        try:
+            if rows < MIN_SCREEN_ROWS:
+                self.scr.addstr("Terminal is not tall enough. "
+                                "Make it taller.\n")
+            if columns < MIN_SCREEN_COLUMNS:
+                self.scr.addstr("Terminal is too narrow. "
+                                "Make it wider.\n")
+        except curses.error:
+            # The message didn't fit, so this much of it will have to do.
+            pass
+        self.scr.noutrefresh()
+        self.backend.doupdate()
+        return False
+
+    def verify_screen_size(self):
+        """
+        Wait for the screen to be big enough, before the main loop runs.
+        """
+        while not self.check_screen_size():
+            self.discard_resize_keys()
+            if self.scr.getch() == curses.KEY_RESIZE:
+                self.update_terminal_size()
+
+    def discard_resize_keys(self):
+        """
+        Drop the KEY_RESIZE events already queued up, so waiting for a
+        key waits for the next change instead, and keep any other keys.
+        """
+        keys = []
+        self.scr.timeout(0)
+        key = self.scr.getch()
+        while key != curses.ERR:
+            if key != curses.KEY_RESIZE:
+                keys.append(key)
+            key = self.scr.getch()
+        self.scr.timeout(-1)
+        for key in reversed(keys):
+            self.unget_key(key)
+
+    def unget_key(self, key):
+        if self.backend is curses:
+            curses.ungetch(key)
+        else:
+            self.scr.keys.insert(0, key)
+
+    def select_hex(self, row, column):
+        self.unselect_hex()
+
+        selected_hex = self.get_hex(row, column)
+        if not selected_hex:
+            return None
+
+        # adjacent_hexes = self.get_adjacent_hexes(row, column)
+        # for hex in adjacent_hexes:
+        #     hex.draw(self.pad, self.palette,
+        #              border_color=self.palette.blue)
+
+        self.renderer.selected = selected_hex
+        self.renderer.mark_hex(selected_hex)
+
+        self.data["selected_hex"] = selected_hex
+        self.data["visible"] = self.fov.get_visible(row, column)
+        if self.exploration:
+            for hex_row, hex_column in \
+                    self.exploration.see(self.data["visible"]):
+                self.renderer.invalidate_hex(self.get_hex(hex_row,
+                                                          hex_column))
+
+    def unselect_hex(self):
+        unselected_hex = self.data["selected_hex"]
+        self.data["selected_hex"] = None
+        self.renderer.selected = None
+        if self.data["route"]:
+            # The route started from the selected hex.
+            self.data["route"] = None
+            self.renderer.set_marked({})
+        if not unselected_hex:
+            return
+        # Repainting the hex's area also brings back the coordinates of
+        # the hex below, which the selection border covered.
+        self.renderer.mark_hex(unselected_hex)
+
+    def get_selected_hex(self):
+        return self.data["selected_hex"]
+
+    def get_selected_hex_pos(self):
+        hex = self.get_selected_hex()
+
+        return hex.get_pos()
+
+    def get_selected_hex_center_pos(self):
+        hex = self.get_selected_hex()
+
+        return hex.get_center_pos()
+
+    def get_hex_screen_relative_pos(self, hex):
+        """
+        Get the relative position of the center of a hex. Relative
+        means a number from 0 (left or top) to 100 (right or bottom).
+        Returns relative_row, relative_column.
+        """
+        hex_row_pos, hex_column_pos = hex.get_center_pos()
+        relative_row = (hex_row_pos - self.row_pos) * 100 // \
+            self.pad_display_rows
+        relative_column = (hex_column_pos - self.column_pos) * 100 // \
+            self.pad_display_columns
+        return relative_row, relative_column
+
+    def move_selected(self, direction):
+        old_selected = self.data["selected_hex"]
+
+        row = old_selected.row
+        column = old_selected.column
+
+        new_selected = self.get_adjacent_hex(row, column, direction)
+
+        if new_selected:
+            self.select_hex(new_selected.row, new_selected.column)
+            return True
+        else:
+            self.print("Trying to move off map.")
+            return False
+
+    def goto(self, row, column):
+        self.row_pos = row
+        self.column_pos = column
+        self.normalize_pos()
+
+    def goto_and_center_on(self, row, column):
+        self.row_pos = row - self.pad_display_rows // 2 + 2
+        self.column_pos = column - self.pad_display_columns // 2 + 4
+        self.normalize_pos()
+
+    def goto_selected(self):
+        pass
+
+    def print(self, text):
+        """
+        Add a message to the info log. It is shown on the next frame.
+        """
+        self.log.add(text)
+
+    def print_nearest_towns(self):
+        hex = self.get_selected_hex()
+        if not hex:
+            return
+
+        towns = self.towns.nearest(hex.row, hex.column, NEAREST_TOWNS,
+                                   TOWN_SEARCH_DISTANCE)
+        if not towns:
+            self.print("No towns nearby.")
+            return
+
+        self.print("Nearest towns:")
+        for distance, row, column in towns:
+            self.print(f"  {column + 1},{row + 1}, {distance} hexes away")
+
+    def find_route(self):
+        """
+        Look for a route from the selected hex to the nearest town, in
+        the background. The pathfinder gets a copy of the area around
+        the two, so it never reads the world while the UI does.
+        """
+        hex = self.get_selected_hex()
+        if not hex:
+            return
+
+        towns = self.towns.nearest(hex.row, hex.column, 1,
+                                   TOWN_SEARCH_DISTANCE)
+        if not towns:
+            self.print("No towns nearby.")
+            return
+
+        distance, row, column = towns[0]
+        world = self.world
+        top = max(min(hex.row, row) - ROUTE_MARGIN, 0)
+        left = max(min(hex.column, column) - ROUTE_MARGIN, 0)
+        bottom = max(hex.row, row) + ROUTE_MARGIN + 1
+        right = max(hex.column, column) + ROUTE_MARGIN + 1
+        if world.rows is not None:
+            bottom = min(bottom, world.rows)
+        if world.columns is not None:
+            right = min(right, world.columns)
+        area = World(bottom - top, right - left)
+        area.write_region(0, 0, area.rows, area.columns,
+                          *world.read_region(top, left, area.rows,
+                                             area.columns))
+
+        def work():
+            return Pathfinder(area).find_path(
+                (hex.row - top, hex.column - left),
+                (row - top, column - left))
+
+        def done(route):
+            if route is None:
+                self.print(f"No way to the town at {column + 1},{row + 1}.")
+                return
+            route = [(route_row + top, route_column + left)
+                     for route_row, route_column in route]
+            self.print(f"Route to the town at {column + 1},{row + 1}: "
+                       f"{len(route) - 1} steps.")
+            if self.get_selected_hex() != hex:
+                # Moved on while it was being found.
+                return
+            self.data["route"] = route
+            self.renderer.set_marked(dict.fromkeys(route, self.palette.red))
+
+        if self.run_job("route", work, done):
+            self.print("Looking for a route...")
+        else:
+            self.print("Already looking for a route.")
+
+    def save(self):
+        """
+        Save the world to SAVE_PATH in the background.
+        """
+        world = self.world
+        if world.rows is None or world.columns is None:
+            self.print("Can't save a world without edges.")
+            return
+
+        seed = self.generator.seed
+        path = SAVE_PATH.format(seed=seed)
+        if isinstance(world, ChunkedWorld):
+            # Generated again from the seed on other processes, instead
+            # of read from the chunks the UI is using.
+            write = partial(generate_file, self.generator, rows=world.rows,
+                            columns=world.columns)
+        else:
+            write = partial(save_world, world,
+                            seed=getattr(world, "seed", seed))
+        # Written next to the file and moved over it, since the world
+        # may be mapped from the very file it is saved to.
+        work = partial(replace_file, path, write)
+
+        if self.run_job("save", work,
+                        lambda result: self.print(f"Saved to {path}."),
+                        lane="save"):
+            self.print(f"Saving to {path}...")
+        else:
+            self.print("Already saving.")
+
+    def info_dump(self):
+        self.print(f"rows:                {str(self.rows):>3} hexagon rows")
+        self.print(f"columns:             {str(self.columns):>3} hexagon cols")
+        self.print(f"seed:                {self.generator.seed}")
+        self.print(f"screen_rows:         {self.screen_rows>3}")
+        self.print(f"screen_columns:      {self.screen_columns:>3}")
+        self.print(f"row_pos:             {self.row_pos:>3}")
+        self.print(f"column_pos:          {self.column_pos:>3}")
+        self.print(f"pad_rows:            {self.pad_rows:>3}")
+        self.print(f"pad_columns:         {self.pad_columns:>3}")
+        self.print(f"pad_display_rows:    {self.pad_display_rows:>3}")
+        self.print(f"pad_display_columns: {self.pad_display_columns:>3}")
+        self.print(f"info_rows:           {self.info_rows:>3}")
+        self.print(f"info_columns:        {self.info_columns:>3}")
+
+
+def main(stdscr, rows=20, columns=30, seed=None, world=None,
+         generator=None, fog=True, profile_path=None, ansi=False):
+    # With ansi, curses only sets the terminal up and reads keys, and the
+    # screen is written by the compositor instead.
+    backend = curses
+    scr = stdscr
+    if ansi:
+        backend = AnsiBackend(stdscr, sys.stdout.buffer)
+        scr = backend.screen
+    palette = Palette()
+    palette.setup(backend)
+
+    ui = TUI(scr, rows, columns, seed, world, backend=backend,
+             palette=palette, generator=generator, fog=fog,
+             profile=bool(profile_path))
+    ui.draw()
+    ui.select_hex(2, 2)
+    try:
+        ui.main_loop()
+    finally:
+        if ansi:
+            backend.close()
+    if profile_path:
+        ui.profiler.save(profile_path)
+    # stdscr.refresh()
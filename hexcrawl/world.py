@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+"""
+Compact storage for the hexes of a world.
+
+Instead of one object per hex, every attribute is kept in a flat typed
+array indexed by row * columns + column, so a hex costs a couple of
+bytes no matter how large the world gets.
+
+A ChunkedWorld splits the world into fixed size chunks which are only
+generated when something first looks at them, and forgotten again when
+they haven't been used for a while. Its size can be left open.
+
+Both tell their listeners about every hex changed through set_terrain
+and set_town.
+"""
+
+from collections import OrderedDict
+
+TERRAINS = ".Fg~"
+PLAIN = 0
+FOREST = 1
+GRASS = 2
+WATER = 3
+
+# Bits in the flags array.
+TOWN = 0x01
+
+CHUNK_ROWS = 32
+CHUNK_COLUMNS = 32
+# About 2 kB per chunk, so the default cap is roughly half a megabyte.
+MAX_CHUNKS = 256
+
+
+class World:
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.terrain = bytearray(rows * columns)
+        self.flags = bytearray(rows * columns)
+        self.listeners = []
+
+    def index(self, row, column):
+        return row * self.columns + column
+
+    def in_bounds(self, row, column):
+        return 0 <= row < self.rows and 0 <= column < self.columns
+
+    def get_terrain(self, row, column):
+        return TERRAINS[self.terrain[self.index(row, column)]]
+
+    def set_terrain(self, row, column, terrain):
+        self.terrain[self.index(row, column)] = TERRAINS.index(terrain)
+        self.changed(row, column)
+
+    def get_flags(self, row, column):
+        return self.flags[self.index(row, column)]
+
+    def is_town(self, row, column):
+        return bool(self.flags[self.index(row, column)] & TOWN)
+
+    def get_cell(self, row, column):
+        """
+        Return the terrain and flags of a hex.
+        """
+        index = self.index(row, column)
+        return TERRAINS[self.terrain[index]], self.flags[index]
+
+    def set_town(self, row, column, town=True):
+        index = self.index(row, column)
+        if town:
+            self.flags[index] |= TOWN
+        else:
+            self.flags[index] &= ~TOWN & 0xff
+        self.changed(row, column)
+
+    def add_listener(self, listener):
+        """
+        Call listener(row, column) whenever a hex is changed, so that it
+        can forget whatever it worked out from the hex before.
+        """
+        self.listeners.append(listener)
+
+    def changed(self, row, column):
+        for listener in self.listeners:
+            listener(row, column)
+
+    def write_region(self, row, column, rows, columns, terrain, flags):
+        """
+        Copy a rows * columns block of terrain and flags, given in row
+        major order, into the world with its top left hex at row, column.
+        """
+        for offset in range(rows):
+            start = self.index(row + offset, column)
+            source = offset * columns
+            self.terrain[start:start + columns] = \
+                terrain[source:source + columns]
+            self.flags[start:start + columns] = flags[source:source + columns]
+
+    def read_region(self, row, column, rows, columns):
+        """
+        Return the terrain and flags of a rows * columns block with its
+        top left hex at row, column, in row major order.
+        """
+        terrain = bytearray()
+        flags = bytearray()
+        for offset in range(rows):
+            start = self.index(row + offset, column)
+            terrain += self.terrain[start:start + columns]
+            flags += self.flags[start:start + columns]
+
+        return terrain, flags
+
+
+class ChunkedWorld:
+
+    def __init__(self, generator, rows=None, columns=None,
+                 max_chunks=MAX_CHUNKS):
+        self.generator = generator
+        self.rows = rows
+        self.columns = columns
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        # Chunks that have been changed since they were generated. These
+        # are never evicted, since they can't be generated again.
+        self.edited = {}
+        self.last_key = None
+        self.last_chunk = None
+        self.listeners = []
+
+    def in_bounds(self, row, column):
+        if row < 0 or column < 0:
+            return False
+        if self.rows is not None and row >= self.rows:
+            return False
+        if self.columns is not None and column >= self.columns:
+            return False
+        return True
+
+    def get_chunk(self, chunk_row, chunk_column):
+        key = (chunk_row, chunk_column)
+        if key == self.last_key:
+            return self.last_chunk
+
+        chunk = self.chunks.get(key)
+        if chunk:
+            self.chunks.move_to_end(key)
+        else:
+            chunk = self.edited.get(key)
+            if not chunk:
+                chunk = self.generate_chunk(chunk_row, chunk_column)
+            self.chunks[key] = chunk
+            while len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+
+        self.last_key = key
+        self.last_chunk = chunk
+        return chunk
+
+    def has_chunk(self, chunk_row, chunk_column):
+        key = (chunk_row, chunk_column)
+        return key in self.chunks or key in self.edited
+
+    def add_chunk(self, chunk_row, chunk_column, chunk):
+        """
+        Keep a chunk that was generated elsewhere, such as on a worker
+        thread, unless there already is one in its place.
+        """
+        if self.has_chunk(chunk_row, chunk_column):
+            return
+
+        self.chunks[chunk_row, chunk_column] = chunk
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+
+    def generate_chunk(self, chunk_row, chunk_column):
+        chunk = World(CHUNK_ROWS, CHUNK_COLUMNS)
+        terrain, flags = self.generator.generate(chunk_row * CHUNK_ROWS,
+                                                 chunk_column * CHUNK_COLUMNS,
+                                                 CHUNK_ROWS, CHUNK_COLUMNS)
+        chunk.write_region(0, 0, CHUNK_ROWS, CHUNK_COLUMNS, terrain, flags)
+        return chunk
+
+    def locate(self, row, column):
+        """
+        Return the chunk holding a hex and the hex's index in that chunk.
+        """
+        chunk_row, local_row = divmod(row, CHUNK_ROWS)
+        chunk_column, local_column = divmod(column, CHUNK_COLUMNS)
+        chunk = self.get_chunk(chunk_row, chunk_column)
+
+        return chunk, local_row * CHUNK_COLUMNS + local_column
+
+    def get_terrain(self, row, column):
+        chunk, index = self.locate(row, column)
+        return TERRAINS[chunk.terrain[index]]
+
+    def set_terrain(self, row, column, terrain):
+        chunk, index = self.locate(row, column)
+        chunk.terrain[index] = TERRAINS.index(terrain)
+        self.edited[self.last_key] = chunk
+        self.changed(row, column)
+
+    def get_flags(self, row, column):
+        chunk, index = self.locate(row, column)
+        return chunk.flags[index]
+
+    def is_town(self, row, column):
+        chunk, index = self.locate(row, column)
+        return bool(chunk.flags[index] & TOWN)
+
+    def get_cell(self, row, column):
+        """
+        Return the terrain and flags of a hex, finding its chunk once.
+        """
+        chunk, index = self.locate(row, column)
+        return TERRAINS[chunk.terrain[index]], chunk.flags[index]
+
+    def set_town(self, row, column, town=True):
+        chunk, index = self.locate(row, column)
+        if town:
+            chunk.flags[index] |= TOWN
+        else:
+            chunk.flags[index] &= ~TOWN & 0xff
+        self.edited[self.last_key] = chunk
+        self.changed(row, column)
+
+    def add_listener(self, listener):
+        """
+        Call listener(row, column) whenever a hex is changed, so that it
+        can forget whatever it worked out from the hex before.
+        """
+        self.listeners.append(listener)
+
+    def changed(self, row, column):
+        for listener in self.listeners:
+            listener(row, column)
+
+    def read_region(self, row, column, rows, columns):
+        """
+        Return the terrain and flags of a rows * columns block with its
+        top left hex at row, column, in row major order. Chunks are
+        generated as needed.
+        """
+        terrain = bytearray()
+        flags = bytearray()
+        for current_row in range(row, row + rows):
+            chunk_row, local_row = divmod(current_row, CHUNK_ROWS)
+            current_column = column
+            while current_column < column + columns:
+                chunk_column, local_column = divmod(current_column,
+                                                    CHUNK_COLUMNS)
+                length = min(CHUNK_COLUMNS - local_column,
+                             column + columns - current_column)
+                chunk = self.get_chunk(chunk_row, chunk_column)
+                start = local_row * CHUNK_COLUMNS + local_column
+                terrain += chunk.terrain[start:start + length]
+                flags += chunk.flags[start:start + length]
+                current_column += length
+
+        return terrain, flags